@@ -9,7 +9,7 @@ from flask import Flask
 APP_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, APP_ROOT.as_posix())
 
-from src.core.database import models
+from src.core.database import generation, models
 
 
 def get_config(file: str) -> str:
@@ -30,6 +30,10 @@ def create_app():
     app.config["SECRET_KEY"] = "secret tunnel"
     db_name = get_config("default.json")["appConfig"]["DB_DBNAME"]
 
+    # Scripts share the app's default config and secrets
+    app.config.update(get_config("default.json")["appConfig"])
+    app.config["AVAILABLE_SECRETS"] = set(get_config("default.json")["secrets"])
+
     with app.app_context():
         app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
         app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://{}:{}@{}/{}".format(
@@ -39,4 +43,7 @@ def create_app():
             db_name,
         )
         models.db.init_app(app)
+
+    # Let the running app know about any changes made
+    generation.init_app(app)
     return app
@@ -0,0 +1,28 @@
+"""Add date indexes
+
+Revision ID: 3b8d5c1e7a42
+Revises: fd1efe346516
+Create Date: 2026-10-18 09:12:44.519032
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3b8d5c1e7a42"
+down_revision = "fd1efe346516"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f("ix_prompts_date"), "prompts", ["date"], unique=False)
+    op.create_index(
+        "ix_prompts_host_id_date", "prompts", ["host_id", "date"], unique=False
+    )
+    op.create_index(op.f("ix_host_dates_date"), "host_dates", ["date"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_host_dates_date"), table_name="host_dates")
+    op.drop_index("ix_prompts_host_id_date", table_name="prompts")
+    op.drop_index(op.f("ix_prompts_date"), table_name="prompts")
@@ -0,0 +1,26 @@
+"""Record the number of failed items in a job
+
+Revision ID: 4d7a1c9e2f60
+Revises: 9e4b2f7c1d83
+Create Date: 2026-10-18 23:04:51.207318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "4d7a1c9e2f60"
+down_revision = "9e4b2f7c1d83"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "jobs",
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("jobs", "failed")
@@ -0,0 +1,31 @@
+"""Add legacy file name to Prompt media
+
+Revision ID: 5f9a0c3e8b14
+Revises: d2e7b4a61f08
+Create Date: 2026-10-18 16:35:02.917455
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5f9a0c3e8b14"
+down_revision = "d2e7b4a61f08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "prompt_media",
+        sa.Column(
+            "legacy_file",
+            sa.String(length=512, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("prompt_media", "legacy_file")
@@ -0,0 +1,28 @@
+"""Add Prompt full-text search index
+
+Revision ID: 6e2c47b0d1f5
+Revises: a4f0e2d9c613
+Create Date: 2026-10-18 11:26:05.101873
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6e2c47b0d1f5"
+down_revision = "a4f0e2d9c613"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ft_prompts_word_content",
+        "prompts",
+        ["word", "content"],
+        unique=False,
+        mysql_prefix="FULLTEXT",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ft_prompts_word_content", table_name="prompts")
@@ -0,0 +1,27 @@
+"""Add image details and variants to Prompt media
+
+Revision ID: 7b3d9e1c5a20
+Revises: 5f9a0c3e8b14
+Create Date: 2026-10-18 18:04:51.330127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "7b3d9e1c5a20"
+down_revision = "5f9a0c3e8b14"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("prompt_media", sa.Column("width", sa.Integer(), nullable=True))
+    op.add_column("prompt_media", sa.Column("height", sa.Integer(), nullable=True))
+    op.add_column("prompt_media", sa.Column("variants", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("prompt_media", "variants")
+    op.drop_column("prompt_media", "height")
+    op.drop_column("prompt_media", "width")
@@ -0,0 +1,54 @@
+"""Create background jobs table
+
+Revision ID: 8c1f3a9d2b57
+Revises: 6e2c47b0d1f5
+Create Date: 2026-10-18 13:41:09.512733
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8c1f3a9d2b57"
+down_revision = "6e2c47b0d1f5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "kind", sa.String(length=20, collation="utf8mb4_unicode_ci"), nullable=False
+        ),
+        sa.Column(
+            "status",
+            sa.String(length=20, collation="utf8mb4_unicode_ci"),
+            nullable=False,
+        ),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column(
+            "result",
+            sa.String(length=512, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+        sa.Column(
+            "error",
+            sa.String(length=1000, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+        sa.Column("date_added", sa.DateTime(), nullable=False),
+        sa.Column("date_updated", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("_id"),
+        comment="Background jobs that are too slow to run during a request.",
+    )
+    op.create_index(op.f("ix_jobs_status"), "jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_jobs_status"), table_name="jobs")
+    op.drop_table("jobs")
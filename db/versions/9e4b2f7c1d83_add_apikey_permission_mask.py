@@ -0,0 +1,47 @@
+"""Add a permission bitmask to API keys
+
+Revision ID: 9e4b2f7c1d83
+Revises: 7b3d9e1c5a20
+Create Date: 2026-10-18 21:12:06.514270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "9e4b2f7c1d83"
+down_revision = "7b3d9e1c5a20"
+branch_labels = None
+depends_on = None
+
+
+# Each permission column and its bit in the mask, as of this revision
+PERMISSION_BITS = {
+    "has_archive": 1,
+    "has_host": 2,
+    "has_notifications": 4,
+    "has_keys": 8,
+    "has_prompt": 16,
+    "has_subscription": 32,
+}
+
+
+def upgrade() -> None:
+    # The database works out the mask itself, so it can never disagree
+    # with the permissions, no matter how a key is added or changed
+    op.add_column(
+        "api_keys",
+        sa.Column(
+            "permissions",
+            sa.Integer(),
+            sa.Computed(
+                " + ".join(f"{name} * {bit}" for name, bit in PERMISSION_BITS.items()),
+                persisted=True,
+            ),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("api_keys", "permissions")
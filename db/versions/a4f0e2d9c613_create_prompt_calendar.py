@@ -0,0 +1,49 @@
+"""Create Prompt calendar summary table
+
+Revision ID: a4f0e2d9c613
+Revises: 3b8d5c1e7a42
+Create Date: 2026-10-18 10:03:27.884105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "a4f0e2d9c613"
+down_revision = "3b8d5c1e7a42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "prompt_calendar",
+        sa.Column("year", sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column(
+            "month", mysql.TINYINT(display_width=2), autoincrement=False, nullable=False
+        ),
+        sa.Column("prompt_count", sa.Integer(), nullable=False),
+        sa.Column("first_date", sa.Date(), nullable=False),
+        sa.Column("last_date", sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint("year", "month"),
+        comment=(
+            "Summary of recorded #vss365 Prompts for each calendar month. "
+            "Kept up to date on every Prompt change for quick browsing."
+        ),
+    )
+
+    # Backfill the calendar with all of the existing Prompts
+    op.execute(
+        """
+        INSERT INTO prompt_calendar
+            (year, month, prompt_count, first_date, last_date)
+        SELECT year(date), month(date), count(_id), min(date), max(date)
+        FROM prompts
+        GROUP BY year(date), month(date)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("prompt_calendar")
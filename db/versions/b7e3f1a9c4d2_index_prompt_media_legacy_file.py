@@ -0,0 +1,27 @@
+"""Index Prompt media legacy file name
+
+Revision ID: b7e3f1a9c4d2
+Revises: 4d7a1c9e2f60
+Create Date: 2026-10-18 23:51:37.385104
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7e3f1a9c4d2"
+down_revision = "4d7a1c9e2f60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        op.f("ix_prompt_media_legacy_file"),
+        "prompt_media",
+        ["legacy_file"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_prompt_media_legacy_file"), table_name="prompt_media")
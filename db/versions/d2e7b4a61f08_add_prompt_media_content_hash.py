@@ -0,0 +1,57 @@
+"""Add content hash and source to Prompt media
+
+Revision ID: d2e7b4a61f08
+Revises: 8c1f3a9d2b57
+Create Date: 2026-10-18 15:12:44.208391
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d2e7b4a61f08"
+down_revision = "8c1f3a9d2b57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "prompt_media",
+        sa.Column(
+            "sha256",
+            sa.String(length=64, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        "prompt_media",
+        sa.Column(
+            "source_url",
+            sa.String(length=512, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+    )
+    op.add_column(
+        "prompt_media",
+        sa.Column(
+            "source_etag",
+            sa.String(length=256, collation="utf8mb4_unicode_ci"),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        op.f("ix_prompt_media_file"), "prompt_media", ["file"], unique=False
+    )
+    op.create_index(
+        op.f("ix_prompt_media_source_url"), "prompt_media", ["source_url"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_prompt_media_source_url"), table_name="prompt_media")
+    op.drop_index(op.f("ix_prompt_media_file"), table_name="prompt_media")
+    op.drop_column("prompt_media", "source_etag")
+    op.drop_column("prompt_media", "source_url")
+    op.drop_column("prompt_media", "sha256")
@@ -0,0 +1,46 @@
+import argparse
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+
+# We have to add the app path to the path to get the db
+APP_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, APP_ROOT.as_posix())
+
+
+from db.dummy_db import create_app
+from src.core.database.v2 import orphans
+
+
+def collect_media_garbage():
+    """Find and clean up media files that no Prompt Media uses."""
+    parser = argparse.ArgumentParser(description=collect_media_garbage.__doc__)
+    parser.add_argument(
+        "action",
+        nargs="?",
+        choices=["dry-run", "remove", "quarantine"],
+        default="dry-run",
+        help="What to do with orphan files. Defaults to only reporting them.",
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--min-age",
+        type=int,
+        default=orphans.MIN_AGE,
+        help="Only touch files older than this many seconds.",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"Collecting media garbage ({args.action})...")
+        stats = orphans.collect(
+            action=args.action, batch_size=args.batch_size, min_age=args.min_age
+        )
+        for name, value in asdict(stats).items():
+            print(f"{name.replace('_', ' ').capitalize()}: {value}")
+
+
+if __name__ == "__main__":
+    collect_media_garbage()
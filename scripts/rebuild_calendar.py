@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+
+# We have to add the app path to the path to get the db
+APP_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, APP_ROOT.as_posix())
+
+
+from db.dummy_db import create_app
+from src.core.database.v2 import calendar
+
+
+def rebuild_calendar():
+    """Rebuild the Prompt calendar summary from all recorded Prompts."""
+    app = create_app()
+    with app.app_context():
+        print("Rebuilding Prompt calendar...")
+        total = calendar.rebuild()
+        print(f"Recorded {total} calendar months.")
+
+
+if __name__ == "__main__":
+    rebuild_calendar()
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+
+# We have to add the app path to the path to get the db
+APP_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, APP_ROOT.as_posix())
+
+
+from db.dummy_db import create_app
+from src.core.database.models import PromptMedia, db
+from src.core.helpers import media
+
+
+def relocate_media():
+    """Move all Prompt media into the sharded, content-addressed store.
+
+    Legacy-named media is hashed into the store, keeping its old name
+    as a link, and stored media is moved into its shard directory.
+    This only needs to be run once, but is safe to run again.
+    """
+    app = create_app()
+    with app.app_context():
+        print("Finding Prompt media to relocate...")
+        qs = db.select(PromptMedia).where(
+            PromptMedia.file.is_not(None), PromptMedia.file.not_like("%/%")
+        )
+        all_media = db.session.execute(qs).scalars().all()
+        print(f"Found {len(all_media)} Prompt media.")
+
+        adopted, relocated, missing = 0, 0, []
+        for pm in all_media:
+            # Legacy media has never been hashed
+            if pm.sha256 is None:
+                if (result := media.adopt(pm.file)) is None:
+                    missing.append(pm.file)
+                    continue
+                pm.legacy_file = pm.file
+                pm.file, pm.sha256 = result
+                adopted += 1
+
+            # Stored media only needs to be moved into its shard
+            else:
+                if (sharded_file := media.relocate(pm.file)) is None:
+                    missing.append(pm.file)
+                    continue
+                pm.file = sharded_file
+                relocated += 1
+        db.session.commit()
+
+        print(f"Adopted {adopted} legacy media and relocated {relocated} media.")
+        for file in missing:
+            print(f"Missing media file: {file}")
+
+
+if __name__ == "__main__":
+    relocate_media()
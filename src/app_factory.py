@@ -5,10 +5,11 @@ import sys_vars
 from flask import Flask
 from flask_cors import CORS
 from flask_smorest import Api
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 import src.configuration as config
-from src.core import logger
-from src.core.database import models
+from src.core import jobs, logger
+from src.core.database import generation, models
 from src.views import v2_blueprints
 
 
@@ -24,6 +25,11 @@ def create_app() -> Flask:
     # Put the app secret key into the expected key
     app.config["SECRET_KEY"] = sys_vars.get("SECRET_KEY_API")
 
+    # Behind reverse proxies, the client's address is only known to them,
+    # so trust the address they forward (and no more than that many of them)
+    if trusted_proxies := app.config["TRUSTED_PROXIES"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
     # Load any extensions
     CORS(app)
     api = Api(app)
@@ -38,6 +44,8 @@ def create_app() -> Flask:
             app.config["DB_DBNAME"],
         )
         models.db.init_app(app)
+        generation.init_app(app)
+        jobs.init_app(app)
 
     # Add a file logger to record errors
     app.logger.addHandler(logger.file_handler(app.config["LOG_PATH"]))
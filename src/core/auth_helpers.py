@@ -1,30 +1,126 @@
-from functools import wraps
-from typing import Any, Callable, NoReturn
-
-from flask import request
+import time
+from collections import OrderedDict
+from functools import cache, wraps
+from hashlib import blake2b
+from threading import Lock
+from typing import Any, Callable, Iterable, NoReturn
+
+from flask import current_app, request
 from flask_smorest import abort
 
+from src.configuration import get_config
+from src.core.database import generation
 from src.core.database.v2 import keys
 
-__all__ = ["fake_authorize", "protect_blueprint", "require_permission"]
+__all__ = [
+    "fake_authorize",
+    "invalidate",
+    "is_valid_key",
+    "protect_blueprint",
+    "require_permission",
+]
 
 
 ALL_PERMISSIONS = keys.available_permissions()
 
 
-def protect_blueprint(*perms: str) -> None | NoReturn:
+class _PermissionCache:
+    """A size-bound, least recently used cache of API key permissions.
+
+    Entries expire after a while even if nothing else throws them out.
+    Keys that don't exist are cached too, so guessing at keys costs
+    the database no more than using a real one.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__entries: OrderedDict[bytes, tuple[float, int | None]] = OrderedDict()
+        self.__lock = Lock()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def get(self, key: bytes) -> tuple[bool, int | None]:
+        with self.__lock:
+            if (entry := self.__entries.get(key)) is None:
+                return False, None
+            if entry[0] < time.monotonic():
+                del self.__entries[key]
+                return False, None
+            self.__entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key: bytes, perms: int | None) -> None:
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.__ttl, perms)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+
+def __cache() -> _PermissionCache | None:
+    # A cache size of zero turns off permission caching entirely
+    if not (max_size := get_config("AUTH_CACHE_SIZE")):
+        return None
+    if (cache := current_app.extensions.get("auth_cache")) is None:
+        cache = current_app.extensions.setdefault(
+            "auth_cache", _PermissionCache(max_size, get_config("AUTH_CACHE_TTL"))
+        )
+    return cache
+
+
+def __permissions(token: str) -> int | None:
+    """Get the permission mask of an API key, or nothing if the key doesn't exist."""
+    # Don't hold onto the keys themselves, only something that identifies them
+    digest = blake2b(token.encode(), digest_size=16).digest()
+    if (cache := __cache()) is None:
+        return keys.permissions(token)
+
+    found, perms = cache.get(digest)
+    if not found:
+        perms = keys.permissions(token)
+        cache.put(digest, perms)
+    return perms
+
+
+def is_valid_key(token: str) -> bool:
+    """Determine if an API key exists.
+
+    The answer comes from the cached permissions when it can,
+    so asking about the same key again costs the database nothing.
+    """
+    return __permissions(token) is not None
+
+
+@generation.on_change
+def invalidate() -> None:
+    """Forget all cached API key permissions.
+
+    Creating, changing, or deleting a key is a database write, so every
+    worker forgets its cached permissions before its next request.
+    """
+    if (cache := current_app.extensions.get("auth_cache")) is not None:
+        cache.clear()
+    return None
+
+
+@cache
+def __compile(perms: Iterable[str]) -> int:
+    """Combine the permissions an endpoint requires into a single mask."""
     # Sanity-check myself to make sure I don't use an non-existent permission
-    all_perms = set(ALL_PERMISSIONS)
-    requested_perms = set(perms)
-    if unknown := requested_perms - all_perms:
-        abort(
-            403,
-            message=f"Unknown permissions attempted to be used: {','.join(unknown)}.",
+    if unknown := set(perms) - set(ALL_PERMISSIONS):
+        raise ValueError(
+            f"Unknown permissions attempted to be used: {','.join(unknown)}."
         )
+    return keys.mask(perms)
+
 
-    # Check if the token has the proper permissions
+def __check(required: int) -> None | NoReturn:
+    """Confirm the request's API key has every permission in the mask."""
     token = get_token_from_request()
-    if not keys.can_access(token, requested_perms):
+    if (__permissions(token) or 0) & required != required:
         abort(
             403,
             message=(
@@ -34,17 +130,27 @@ def protect_blueprint(*perms: str) -> None | NoReturn:
     return None
 
 
+def protect_blueprint(*perms: str) -> None | NoReturn:
+    try:
+        required = __compile(perms)
+    except ValueError as exc:
+        abort(403, message=str(exc))
+    return __check(required)
+
+
 def require_permission(*perms: str) -> Callable[..., Any]:
     """Protect a single endpoint with the specified permissions.
 
     This decorator is useful when a single endpoint
     needs to be protected but not the entire blueprint.
     """
+    # The permissions never change, so only work out what they mean once
+    required = __compile(perms)
 
     def decorator(func) -> Callable[..., Any]:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Callable[..., Any]:
-            protect_blueprint(*perms)
+            __check(required)
 
             return func(*args, **kwargs)
 
@@ -65,7 +171,7 @@ def get_token_from_request() -> str | NoReturn:
 
     # Attempt to get the API key and validate it
     try:
-        if not keys.exists(request.authorization.token):
+        if __permissions(request.authorization.token) is None:
             raise KeyError
         return request.authorization.token
     except (KeyError, IndexError):
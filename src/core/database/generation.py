@@ -0,0 +1,150 @@
+import fcntl
+import mmap
+import os
+import struct
+import time
+from itertools import chain
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from src.configuration import get_config
+
+
+__all__ = ["bump", "check", "current", "init_app", "last_modified", "on_change"]
+
+
+# The generation number and the time it was last changed
+_LAYOUT = struct.Struct("<Qd")
+
+# Everything that needs to be told when the data has changed
+_LISTENERS: list[Callable[[], Any]] = []
+
+
+class _SharedCounter:
+    """A data generation counter shared by every process on this machine.
+
+    The counter is kept in a small memory-mapped file, meaning reading it
+    is just a memory read. Changing it takes a file lock so concurrent
+    writes from multiple workers are never lost.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        try:
+            # The counter is seeded from the clock rather than zero so it keeps
+            # increasing even if the file is lost (such as on a reboot)
+            if os.fstat(self.__fd).st_size < _LAYOUT.size:
+                now = time.time()
+                os.ftruncate(self.__fd, _LAYOUT.size)
+                os.pwrite(self.__fd, _LAYOUT.pack(int(now * 1_000_000), now), 0)
+            self.__map = mmap.mmap(self.__fd, _LAYOUT.size)
+        finally:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+        # The generation this process last acted on
+        self.seen = self.read()[0]
+
+    def bump(self) -> int:
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        try:
+            generation = self.read()[0] + 1
+            _LAYOUT.pack_into(self.__map, 0, generation, time.time())
+            return generation
+        finally:
+            fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+    def read(self) -> tuple[int, float]:
+        return _LAYOUT.unpack_from(self.__map, 0)
+
+
+def __counter() -> _SharedCounter:
+    return current_app.extensions["data_generation"]
+
+
+def bump() -> int:
+    """Record that the data has changed, letting every worker know about it."""
+    generation = __counter().bump()
+    check()
+    return generation
+
+
+def check() -> None:
+    """Tell all listeners if the data has changed since this process last checked."""
+    counter = __counter()
+    if (generation := counter.read()[0]) != counter.seen:
+        counter.seen = generation
+        for listener in _LISTENERS:
+            listener()
+    return None
+
+
+def current() -> int:
+    """Get the current data generation."""
+    return __counter().read()[0]
+
+
+def init_app(app: Flask) -> None:
+    """Check for data changes made by any worker at the start of every request."""
+    with app.app_context():
+        path = Path(get_config("DATA_GENERATION_FILE"))
+    app.extensions["data_generation"] = _SharedCounter(path)
+    app.before_request(check)
+    return None
+
+
+def last_modified() -> datetime:
+    """Get the time the data was last changed."""
+    return datetime.fromtimestamp(__counter().read()[1], timezone.utc)
+
+
+def on_change(listener: Callable[[], Any]) -> Callable[[], Any]:
+    """Register a function to be called whenever the data changes."""
+    _LISTENERS.append(listener)
+    return listener
+
+
+def _is_tracked(table: Any) -> bool:
+    """Determine if writes to a table change the data generation.
+
+    Tables can opt out with `{"info": {"data_generation": False}}`.
+    """
+    return getattr(table, "info", {}).get("data_generation", True)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_writes(session: Session, *args: Any) -> None:
+    """Note when a session has written changes to the database."""
+    changed = chain(session.new, session.dirty, session.deleted)
+    if any(_is_tracked(getattr(obj, "__table__", None)) for obj in changed):
+        session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_writes(orm_execute_state: ORMExecuteState) -> None:
+    """Note when a session runs an INSERT, UPDATE, or DELETE statement directly."""
+    if orm_execute_state.is_select:
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or _is_tracked(mapper.local_table):
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session: Session) -> None:
+    session.info.pop("has_writes", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_write(session: Session) -> None:
+    """Bump the generation after any committed write, no matter where it came from."""
+    # Apps that don't use the generation (such as some scripts) have nothing to bump
+    if session.info.pop("has_writes", False) and has_app_context():
+        if "data_generation" in current_app.extensions:
+            bump()
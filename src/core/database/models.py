@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 from typing import Any, TypedDict
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, ForeignKey, inspect, select
+from sqlalchemy import Column, ColumnElement, Computed, ForeignKey, Index, inspect
 from sqlalchemy.dialects.mysql import TINYINT
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
@@ -14,16 +14,18 @@ from sqlalchemy.orm import (
     mapped_column,
     relationship,
 )
-from sqlalchemy.types import BigInteger, DateTime, String
+from sqlalchemy.types import JSON, BigInteger, DateTime, SmallInteger, String
 
 __all__ = [
     "ApiKey",
     "ApiKeyHistory",
     "Email",
     "Prompt",
+    "PromptCalendar",
     "PromptMedia",
     "Host",
     "HostDate",
+    "Job",
     "db",
 ]
 
@@ -77,7 +79,7 @@ class HostDate(Base):
     __table_args__ = {"comment": "Store the hosting dates of #vss365 Hosts."}
 
     _id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    date: Mapped[date_obj]
+    date: Mapped[date_obj] = mapped_column(index=True)
     host_id: Mapped[int] = mapped_column(
         ForeignKey("hosts._id", ondelete="CASCADE", onupdate="CASCADE")
     )
@@ -86,7 +88,11 @@ class HostDate(Base):
 
 class Prompt(HelperMethods, Base):
     __tablename__ = "prompts"
-    __table_args__ = {"comment": "Store the #vss365 Prompts."}
+    __table_args__ = (
+        Index("ix_prompts_host_id_date", "host_id", "date"),
+        Index("ft_prompts_word_content", "word", "content", mysql_prefix="FULLTEXT"),
+        {"comment": "Store the #vss365 Prompts."},
+    )
 
     def __str__(self) -> str:
         return f"Prompt {self._id}, {self.date.isoformat()}, {self.word}"
@@ -95,7 +101,7 @@ class Prompt(HelperMethods, Base):
     twitter_id: Mapped[str] = mapped_column(
         String(30, collation="utf8mb4_unicode_ci"), unique=True
     )
-    date: Mapped[date_obj]
+    date: Mapped[date_obj] = mapped_column(index=True)
     date_added: Mapped[datetime] = Column(
         DateTime,
         nullable=False,
@@ -108,22 +114,39 @@ class Prompt(HelperMethods, Base):
         ForeignKey("hosts._id", ondelete="RESTRICT", onupdate="CASCADE")
     )
 
-    host: Mapped["Host"] = relationship(back_populates="prompts")
-    media: Mapped[list["PromptMedia"]] = relationship(back_populates="prompt")
-
-    url = column_property(
-        "https://twitter.com/"
-        + select(Host.handle)
-        .where(Host._id == host_id)
-        .correlate_except(Host)
-        .scalar_subquery()
-        + "/status/"
-        + twitter_id
+    # A Prompt is never used without its Host and media, so always load them
+    # alongside the Prompt instead of lazy-loading them for every single Prompt
+    host: Mapped["Host"] = relationship(back_populates="prompts", lazy="joined")
+    media: Mapped[list["PromptMedia"]] = relationship(
+        back_populates="prompt",
+        lazy="selectin",
+        # The database deletes the media with the Prompt, so leave it to the FK
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
+    @hybrid_property
+    def url(self) -> str:
+        """Build the Prompt's Tweet URL from the already-loaded Host."""
+        return f"https://twitter.com/{self.host.handle}/status/{self.twitter_id}"
+
+    @url.inplace.expression
+    @classmethod
+    def _url_expression(cls) -> ColumnElement[str]:
+        # Selecting the URL in a query requires the Host to be joined in
+        return "https://twitter.com/" + Host.handle + "/status/" + cls.twitter_id
+
     @hybrid_property
     def navigation(self) -> PromptNavigation:
-        """Get the previous/next Prompt dates."""
+        """Get the previous/next Prompt dates.
+
+        When a list of Prompts is fetched, the navigation is batch-loaded
+        ahead of time. This is only a fallback for a single Prompt.
+        """
+        # The navigation was already loaded for us, don't query for it again
+        if (navi := self.__dict__.get("_navigation")) is not None:
+            return navi
+
         # Because the previous or next day is not always available,
         # we must be careful to handle NoneType values correctly
         navi = PromptNavigation(next=None, previous=None)
@@ -150,6 +173,10 @@ class Prompt(HelperMethods, Base):
             )
         return navi
 
+    @navigation.inplace.setter
+    def _navigation_setter(self, navi: PromptNavigation) -> None:
+        self._navigation = navi
+
 
 class PromptMedia(HelperMethods, Base):
     __tablename__ = "prompt_media"
@@ -157,7 +184,7 @@ class PromptMedia(HelperMethods, Base):
 
     _id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     file: Mapped[str | None] = mapped_column(
-        String(512, collation="utf8mb4_unicode_ci")
+        String(512, collation="utf8mb4_unicode_ci"), index=True
     )
     alt_text: Mapped[str | None] = mapped_column(
         String(1000, collation="utf8mb4_unicode_ci")
@@ -166,9 +193,85 @@ class PromptMedia(HelperMethods, Base):
         ForeignKey("prompts._id", ondelete="CASCADE", onupdate="CASCADE")
     )
 
+    # Media files are stored by their contents, and are only downloaded again
+    # from their source if the source reports they have changed. Media saved
+    # before that keeps a link under its legacy name, removed along with it
+    sha256: Mapped[str | None] = mapped_column(
+        String(64, collation="utf8mb4_unicode_ci")
+    )
+    legacy_file: Mapped[str | None] = mapped_column(
+        String(512, collation="utf8mb4_unicode_ci"), index=True
+    )
+    source_url: Mapped[str | None] = mapped_column(
+        String(512, collation="utf8mb4_unicode_ci"), index=True
+    )
+    source_etag: Mapped[str | None] = mapped_column(
+        String(256, collation="utf8mb4_unicode_ci")
+    )
+
+    # Image details and the resized/re-encoded variant file names,
+    # filled in by a background job after the media is saved
+    width: Mapped[int | None]
+    height: Mapped[int | None]
+    variants: Mapped[dict | None] = mapped_column(JSON(none_as_null=True))
+
     prompt: Mapped["Prompt"] = relationship(back_populates="media")
 
 
+class PromptCalendar(HelperMethods, Base):
+    __tablename__ = "prompt_calendar"
+    __table_args__ = {
+        "comment": (
+            "Summary of recorded #vss365 Prompts for each calendar month. "
+            "Kept up to date on every Prompt change for quick browsing."
+        )
+    }
+
+    year: Mapped[int] = mapped_column(
+        SmallInteger, primary_key=True, autoincrement=False
+    )
+    month: Mapped[int] = mapped_column(
+        TINYINT(2), primary_key=True, autoincrement=False
+    )
+    prompt_count: Mapped[int]
+    first_date: Mapped[date_obj]
+    last_date: Mapped[date_obj]
+
+
+class Job(HelperMethods, Base):
+    __tablename__ = "jobs"
+    __table_args__ = {
+        "comment": "Background jobs that are too slow to run during a request.",
+        # Job bookkeeping is not public data, so it doesn't bump the data generation
+        "info": {"data_generation": False},
+    }
+
+    _id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20, collation="utf8mb4_unicode_ci"))
+    status: Mapped[str] = mapped_column(
+        String(20, collation="utf8mb4_unicode_ci"), default="queued", index=True
+    )
+    payload: Mapped[dict] = mapped_column(JSON)
+    progress: Mapped[int] = mapped_column(default=0)
+    failed: Mapped[int] = mapped_column(default=0, server_default="0")
+    total: Mapped[int] = mapped_column(default=0)
+    result: Mapped[str | None] = mapped_column(
+        String(512, collation="utf8mb4_unicode_ci")
+    )
+    error: Mapped[str | None] = mapped_column(
+        String(1000, collation="utf8mb4_unicode_ci")
+    )
+    date_added: Mapped[datetime] = Column(
+        DateTime, nullable=False, default=datetime.now
+    )
+    date_updated: Mapped[datetime] = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.now,
+        onupdate=datetime.now,
+    )
+
+
 class Email(Base):
     __tablename__ = "emails"
     __table_args__ = {
@@ -211,6 +314,17 @@ class ApiKey(HelperMethods, Base):
     has_prompts: Mapped[bool] = mapped_column("has_prompt", default=False)
     has_emails: Mapped[bool] = mapped_column("has_subscription", default=False)
 
+    # All of the above permissions as a single bitmask, one bit per permission
+    # in the order they are declared. The database keeps it in step with the
+    # individual permissions, so new permissions must only ever be added to the end
+    permissions: Mapped[int] = mapped_column(
+        Computed(
+            "has_archive * 1 + has_host * 2 + has_notifications * 4"
+            " + has_keys * 8 + has_prompt * 16 + has_subscription * 32",
+            persisted=True,
+        )
+    )
+
     history: Mapped[list["ApiKeyHistory"]] = relationship(back_populates="key")
 
 
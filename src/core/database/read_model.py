@@ -0,0 +1,327 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import NamedTuple
+
+from flask import current_app
+
+from src.configuration import get_config
+from src.core.database import generation
+from src.core.database.models import (
+    Host,
+    HostDate,
+    Prompt,
+    PromptMedia,
+    PromptNavigation,
+    db,
+)
+from src.core.helpers import month_range, year_range
+
+
+__all__ = [
+    "HostView",
+    "MediaView",
+    "PromptView",
+    "Snapshot",
+    "enabled",
+    "invalidate",
+    "snapshot",
+]
+
+
+@dataclass(frozen=True, slots=True)
+class MediaView:
+    _id: int
+    alt_text: str | None
+    file: str | None
+    width: int | None
+    height: int | None
+    variants: dict | None
+
+
+@dataclass(frozen=True, slots=True)
+class HostDateView:
+    _id: int
+    host_id: int
+    date: date
+
+
+@dataclass(frozen=True, slots=True)
+class HostView:
+    _id: int
+    handle: str
+    twitter_uid: str
+    dates: tuple[HostDateView, ...] = ()
+
+    @property
+    def url(self) -> str:
+        return f"https://twitter.com/{self.handle}"
+
+
+@dataclass(frozen=True, slots=True)
+class PromptView:
+    _id: int
+    twitter_id: str
+    date: date
+    date_added: datetime
+    word: str
+    content: str
+    host_id: int
+    host: HostView
+    media: tuple[MediaView, ...] = ()
+    navigation: PromptNavigation = field(
+        default_factory=lambda: PromptNavigation(next=None, previous=None)
+    )
+
+    @property
+    def handle(self) -> str:
+        return self.host.handle
+
+    @property
+    def url(self) -> str:
+        return f"https://twitter.com/{self.host.handle}/status/{self.twitter_id}"
+
+    def as_dict(self) -> dict:
+        """Return the Prompt as a dictionary, just like `Prompt.as_dict()`."""
+        return {
+            "_id": self._id,
+            "twitter_id": self.twitter_id,
+            "date": self.date,
+            "date_added": self.date_added,
+            "word": self.word,
+            "content": self.content,
+            "host_id": self.host_id,
+        }
+
+
+class YearTotal(NamedTuple):
+    year: int
+    total: int
+
+
+class MonthTotal(NamedTuple):
+    month: int
+    total: int
+
+
+class Snapshot:
+    """An immutable, indexed copy of all public Prompt and Host data.
+
+    The whole public dataset is small enough to keep in memory,
+    letting public reads be answered without any database round trips.
+    """
+
+    def __init__(
+        self,
+        hosts: list[HostView],
+        host_dates: list[HostDateView],
+        prompts: list[PromptView],
+    ) -> None:
+        self.hosts = tuple(hosts)
+        self.__hosts_by_handle = {host.handle: host for host in hosts}
+        hosts_by_id = {host._id: host for host in hosts}
+
+        # Hosting dates are kept sorted so date ranges can be binary searched
+        host_dates = sorted(host_dates, key=lambda hd: hd.date)
+        self.__host_dates = [hd.date for hd in host_dates]
+        self.__host_date_hosts = [hosts_by_id[hd.host_id] for hd in host_dates]
+
+        # Prompts are indexed by date, by Host, and by calendar month
+        by_date: defaultdict[date, list[PromptView]] = defaultdict(list)
+        by_host: defaultdict[str, list[PromptView]] = defaultdict(list)
+        calendar: defaultdict[int, set[int]] = defaultdict(set)
+        for prompt in sorted(prompts, key=lambda p: (p.date, p._id)):
+            by_date[prompt.date].append(prompt)
+            by_host[prompt.host.handle].append(prompt)
+            calendar[prompt.date.year].add(prompt.date.month)
+        self.__prompts_by_date = {d: tuple(ps) for d, ps in by_date.items()}
+        self.__prompts_by_host = {h: tuple(ps) for h, ps in by_host.items()}
+        self.__dates = sorted(self.__prompts_by_date)
+        self.__calendar = {year: sorted(months) for year, months in calendar.items()}
+
+    def __prompts_between(self, start: date, end: date) -> list[PromptView]:
+        """Get all released Prompts in the half-open date range, oldest first."""
+        end = min(end, date.today() + timedelta(days=1))
+        lo = bisect_left(self.__dates, start)
+        hi = bisect_left(self.__dates, end)
+        return [p for d in self.__dates[lo:hi] for p in self.__prompts_by_date[d]]
+
+    def __hosts_between(self, start: date, end: date) -> list[HostView]:
+        """Get the Host for each past Hosting Date in the half-open date range."""
+        end = min(end, date.today() + timedelta(days=1))
+        lo = bisect_left(self.__host_dates, start)
+        hi = bisect_left(self.__host_dates, end)
+        return self.__host_date_hosts[lo:hi]
+
+    def host(self, handle: str) -> HostView | None:
+        if (host := self.__hosts_by_handle.get(handle)) is None:
+            return None
+
+        # Take out any future Hosting Dates
+        today = date.today()
+        return replace(host, dates=tuple(hd for hd in host.dates if hd.date <= today))
+
+    def host_by_date(self, given_date: date) -> HostView | None:
+        lo = bisect_left(self.__host_dates, given_date)
+        hi = bisect_right(self.__host_dates, given_date)
+        return self.__host_date_hosts[lo] if lo < hi else None
+
+    def host_exists(self, handle: str) -> bool:
+        return handle in self.__hosts_by_handle
+
+    def hosts_by_calendar_month(self, year: int, month: int) -> list[HostView]:
+        return self.__hosts_between(*month_range(year, month))
+
+    def hosts_by_year(self, year: int) -> list[HostView]:
+        return self.__hosts_between(*year_range(year))
+
+    def months(self, year: int) -> list[MonthTotal]:
+        # Only count released Prompts, so future Prompt months are left out
+        totals = (
+            MonthTotal(month, len(self.prompts_by_calendar_month(year, month)))
+            for month in self.__calendar.get(year, [])
+        )
+        return [total for total in totals if total.total]
+
+    def prompts_by_calendar_month(self, year: int, month: int) -> list[PromptView]:
+        return self.__prompts_between(*month_range(year, month))
+
+    def prompts_by_date(self, prompt_date: date) -> list[PromptView]:
+        # Don't expose tomorrow's (or next week's) Prompt
+        if prompt_date > date.today():
+            return []
+        return list(self.__prompts_by_date.get(prompt_date, ()))
+
+    def prompts_by_host(self, handle: str) -> list[PromptView]:
+        today = date.today()
+        return [p for p in self.__prompts_by_host.get(handle, ()) if p.date <= today]
+
+    def prompts_current(self) -> list[PromptView]:
+        if not self.__dates:
+            return []
+        return list(self.__prompts_by_date[self.__dates[-1]])
+
+    def years(self) -> list[YearTotal]:
+        # Be sure to filter out any future, as of yet unreleased, Prompt years
+        totals = (
+            YearTotal(year, sum(m.total for m in self.months(year)))
+            for year in sorted(self.__calendar)
+        )
+        return [total for total in totals if total.total]
+
+
+def _neighbor(prompt_date: date, days: int, all_dates: set[date]) -> date | None:
+    """Get the date the given number of days away, if a Prompt was recorded on it."""
+    neighbor = prompt_date + timedelta(days=days)
+    return neighbor if neighbor in all_dates else None
+
+
+def _build() -> Snapshot:
+    """Load the entire public dataset from the database."""
+    host_dates = [
+        HostDateView(*row)
+        for row in db.session.execute(
+            db.select(HostDate._id, HostDate.host_id, HostDate.date)
+        ).all()
+    ]
+    dates_by_host: defaultdict[int, list[HostDateView]] = defaultdict(list)
+    for hd in sorted(host_dates, key=lambda hd: hd.date):
+        dates_by_host[hd.host_id].append(hd)
+
+    hosts = {
+        row._id: HostView(
+            row._id, row.handle, row.twitter_uid, tuple(dates_by_host[row._id])
+        )
+        for row in db.session.execute(
+            db.select(Host._id, Host.handle, Host.twitter_uid).order_by(Host._id)
+        ).all()
+    }
+
+    media: defaultdict[int, list[MediaView]] = defaultdict(list)
+    for row in db.session.execute(
+        db.select(
+            PromptMedia._id,
+            PromptMedia.alt_text,
+            PromptMedia.file,
+            PromptMedia.width,
+            PromptMedia.height,
+            PromptMedia.variants,
+            PromptMedia.prompt_id,
+        ).order_by(PromptMedia._id)
+    ).all():
+        media[row.prompt_id].append(
+            MediaView(
+                row._id, row.alt_text, row.file, row.width, row.height, row.variants
+            )
+        )
+
+    rows = db.session.execute(
+        db.select(
+            Prompt._id,
+            Prompt.twitter_id,
+            Prompt.date,
+            Prompt.date_added,
+            Prompt.word,
+            Prompt.content,
+            Prompt.host_id,
+        )
+    ).all()
+
+    # The navigation only links to the directly surrounding days
+    all_dates = {row.date for row in rows}
+    prompts = [
+        PromptView(
+            **row._asdict(),
+            host=hosts[row.host_id],
+            media=tuple(media[row._id]),
+            navigation=PromptNavigation(
+                previous=_neighbor(row.date, -1, all_dates),
+                next=_neighbor(row.date, 1, all_dates),
+            ),
+        )
+        for row in rows
+    ]
+    return Snapshot(list(hosts.values()), host_dates, prompts)
+
+
+class _ReadModel:
+    """Hold the current snapshot for an app, rebuilding it when it goes stale."""
+
+    def __init__(self) -> None:
+        self.__snapshot: Snapshot | None = None
+        self.__lock = Lock()
+
+    def get(self) -> Snapshot:
+        if (current := self.__snapshot) is None:
+            # Only build the snapshot once, even if multiple reads come in at once.
+            # The new snapshot is fully built before it replaces the old one,
+            # so a reader never sees a partially-built snapshot
+            with self.__lock:
+                if (current := self.__snapshot) is None:
+                    current = self.__snapshot = _build()
+        return current
+
+    def invalidate(self) -> None:
+        self.__snapshot = None
+
+
+def enabled() -> bool:
+    """Determine if public reads should be answered from the read model."""
+    return bool(get_config("ENABLE_READ_MODEL"))
+
+
+@generation.on_change
+def invalidate() -> None:
+    """Throw out the current snapshot so it is rebuilt on the next read."""
+    if (model := current_app.extensions.get("read_model")) is not None:
+        model.invalidate()
+    return None
+
+
+def snapshot() -> Snapshot:
+    """Get the current snapshot of the public dataset."""
+    if (model := current_app.extensions.get("read_model")) is None:
+        model = current_app.extensions.setdefault("read_model", _ReadModel())
+    return model.get()
@@ -1,4 +1,22 @@
-from src.core.database.v2 import archive, emails, hosts, keys, prompts
+from src.core.database.v2 import (
+    archive,
+    calendar,
+    emails,
+    hosts,
+    jobs,
+    keys,
+    orphans,
+    prompts,
+)
 
 
-__all__ = ["archive", "emails", "hosts", "keys", "prompts"]
+__all__ = [
+    "archive",
+    "calendar",
+    "emails",
+    "hosts",
+    "jobs",
+    "keys",
+    "orphans",
+    "prompts",
+]
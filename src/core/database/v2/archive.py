@@ -1,40 +1,182 @@
-from datetime import date
+import csv
+import fcntl
+import hashlib
+import io
+import json
+from contextlib import suppress
+from datetime import date, datetime
+from itertools import groupby
 from pathlib import Path
+from secrets import token_hex
+from typing import Callable, Iterator, NamedTuple, Sequence, TypedDict
 
 import xlsxwriter
 from sqlalchemy.engine.row import Row
-from sqlalchemy.sql import func
+from sqlalchemy.sql import and_, extract, func, or_
 
-from src.configuration import get_secret
+from flask import current_app
+
+from src.configuration import get_config, get_secret
+from src.core.database import generation
 from src.core.database.models import Host, Prompt, db
-from src.core.database.v2 import prompts
-from src.core.helpers import format_datetime_pretty
+from src.core.helpers import format_datetime_pretty, year_range
+
+# pyarrow is only needed for Parquet exports. Without it,
+# the other export formats are still available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore[assignment]
 
-__all__ = ["create", "current"]
+__all__ = [
+    "EXPORT_FORMATS",
+    "FILE_MIMETYPE",
+    "ArchiveFile",
+    "Export",
+    "count",
+    "create",
+    "current",
+    "export",
+    "get",
+    "path",
+]
 
 # Set some constants for a consistent filename
 FILE_NAME_BASE = "vss365today-prompt-archive-"
 FILE_NAME_EXT = ".xlsx"
+FILE_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
+# Every published archive is recorded in this file in the save directory,
+# and publishing is done while holding a lock on the lock file
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK_NAME = ".manifest.lock"
 
-def __get_column_widths(year: int) -> Row:
-    """Determine the best column widths for the given year data."""
-    qs = (
-        db.select(
-            (func.max(func.length(Prompt.word)) + 2).label("longest_word"),
-            (func.max(func.length(Host.handle)) + 2).label("longest_handle"),
-            (
-                (func.max(func.length(Host.handle)))
-                + (func.max(func.length(Prompt.twitter_id)) + 29)
-            ).label("longest_url"),
-        )
-        .filter(
-            func.year(Prompt.date) == year,
-            func.year(Prompt.date) <= date.today().year,
-        )
-        .join(Host)
+# How many Prompts are fetched from the database at a time
+BATCH_SIZE = 500
+
+# The machine-friendly export formats, by file extension, and their MIME types
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class ArchiveFile(TypedDict):
+    file_name: str
+    size: int
+    sha256: str
+    date_generated: datetime
+
+
+class Export(NamedTuple):
+    file_name: str
+    mimetype: str
+    chunks: Iterator[bytes]
+
+
+def __save_dir() -> Path:
+    return Path(get_secret("DOWNLOADS_DIR")).resolve()
+
+
+def __describe(path: Path, file_name: str, generated: datetime) -> ArchiveFile:
+    """Record everything needed to serve an archive file."""
+    with path.open("rb") as f:
+        sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+    return ArchiveFile(
+        file_name=file_name,
+        size=path.stat().st_size,
+        sha256=sha256,
+        date_generated=generated,
     )
-    return db.session.execute(qs).first()
+
+
+def __write_manifest(save_dir: Path, archives: list[ArchiveFile]) -> None:
+    # The manifest is read on every request, so replace it all at once
+    temp_path = save_dir / f".{MANIFEST_NAME}.{token_hex(4)}.tmp"
+    temp_path.write_text(
+        json.dumps(
+            [
+                {**archive, "date_generated": archive["date_generated"].isoformat()}
+                for archive in archives
+            ],
+            indent=2,
+        ),
+        "utf-8",
+    )
+    temp_path.replace(save_dir / MANIFEST_NAME)
+    return None
+
+
+def __read_manifest(save_dir: Path, *, locked: bool = False) -> list[ArchiveFile]:
+    """Get every published archive, newest first.
+
+    The manifest is only read again once it has been replaced,
+    so most of the time this costs no more than a single `stat()`.
+    Only a caller that already holds the manifest lock should say so.
+    """
+    try:
+        info = (save_dir / MANIFEST_NAME).stat()
+
+    # Archives were published before there was a manifest, so record them now.
+    # Someone else could be doing the same or publishing a new archive,
+    # so wait our turn and check there still isn't a manifest
+    except FileNotFoundError:
+        if not locked:
+            with (save_dir / MANIFEST_LOCK_NAME).open("a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                return __read_manifest(save_dir, locked=True)
+
+        archives = [
+            __describe(f, f.name, datetime.fromtimestamp(f.stat().st_mtime))
+            for f in sorted(
+                save_dir.glob(f"*{FILE_NAME_EXT}"),
+                key=lambda f: f.stat().st_mtime,
+                reverse=True,
+            )
+        ]
+        __write_manifest(save_dir, archives)
+        return archives
+
+    version = (info.st_ino, info.st_mtime_ns)
+    cached = current_app.extensions.get("archive_manifest")
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    archives = [
+        ArchiveFile(
+            file_name=archive["file_name"],
+            size=archive["size"],
+            sha256=archive["sha256"],
+            date_generated=datetime.fromisoformat(archive["date_generated"]),
+        )
+        for archive in json.loads((save_dir / MANIFEST_NAME).read_text("utf-8"))
+    ]
+    current_app.extensions["archive_manifest"] = (version, archives)
+    return archives
+
+
+def __publish(save_dir: Path, temp_path: Path, file_name: str) -> None:
+    """Publish a finished archive, pruning the archives we no longer keep."""
+    archive = __describe(temp_path, file_name, datetime.now())
+    keep = max(1, get_config("ARCHIVE_RETENTION"))
+
+    # Only one archive can be published at a time, even between workers
+    with (save_dir / MANIFEST_LOCK_NAME).open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        temp_path.replace(save_dir / file_name)
+        archives = [archive] + [
+            a
+            for a in __read_manifest(save_dir, locked=True)
+            if a["file_name"] != file_name
+        ]
+
+        # Stop handing out the old archives before they are removed
+        __write_manifest(save_dir, archives[:keep])
+        for pruned in archives[keep:]:
+            (save_dir / pruned["file_name"]).unlink(missing_ok=True)
+    return None
 
 
 def __get_prompt_date_range() -> Row:
@@ -50,40 +192,152 @@ def __get_prompt_date_range() -> Row:
     return db.session.execute(qs).first()
 
 
-def __get_prompts_by_year(year: int) -> list[Row]:
-    """Get all relevant Prompt information for the archive for the given year."""
+def __archived_prompts():
+    """Everything up through the end of this year belongs in the archive."""
+    return Prompt.date < year_range(date.today().year)[1]
+
+
+def __select_prompts():
+    """Select the Prompt information every archive format is made from."""
+    return db.select(
+        Prompt.date,
+        Prompt.word,
+        Host.handle,
+        Prompt.url,
+        Prompt.content,
+    ).join(Host)
+
+
+def __fingerprints() -> dict[int, str]:
+    """Fingerprint the Prompts of every archived year.
+
+    Adding or deleting a Prompt changes its year's Prompt count, and
+    editing one moves its `date_added`. Hosts are fingerprinted as
+    a whole, as a changed handle can touch any year they hosted.
+    """
+    hosts = db.session.execute(db.select(Host._id, Host.handle).order_by(Host._id))
+    hosts_digest = hashlib.blake2b(
+        repr(hosts.all()).encode(), digest_size=8
+    ).hexdigest()
+
     qs = (
-        db.select(Host.handle, Prompt.date, Prompt.url, Prompt.word, Prompt.content)
-        .join(Host)
-        .filter(func.year(Prompt.date) == year)
-        .order_by(Prompt.word)
+        db.select(
+            extract("year", Prompt.date).label("year"),
+            func.count(Prompt._id).label("total"),
+            func.max(Prompt.date_added).label("newest"),
+        )
+        .filter(__archived_prompts())
+        .group_by("year")
+        .order_by("year")
     )
-    return db.session.execute(qs).all()
+    return {
+        int(year.year): f"{year.total}:{year.newest}:{hosts_digest}"
+        for year in db.session.execute(qs)
+    }
 
 
-def create() -> str | None:
-    """Generate a new Prompt archive."""
-    # Check that we have permission to write to the save directory
-    save_dir = Path(get_secret("DOWNLOADS_DIR")).resolve()
+def __cache_dir() -> Path:
+    """Get the folder each year's rendered sheet rows are cached in.
+
+    The cache is kept out of the download directory
+    so it can never be handed out as an archive.
+    """
+    cache_dir = Path(get_config("ARCHIVE_CACHE_DIR")).resolve()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def __cached_fingerprint(cache_file: Path) -> str | None:
+    """Get the fingerprint of the Prompts a year's cached rows came from."""
+    with suppress(OSError, ValueError), cache_file.open("r", encoding="utf-8") as f:
+        return json.loads(f.readline())
+    return None
+
+
+def __read_rows(cache_file: Path) -> Iterator[list[str]]:
+    """Stream a year's sheet rows back out of its cache."""
+    with cache_file.open("r", encoding="utf-8") as f:
+        next(f)
+        for line in f:
+            yield json.loads(line)
+
+
+def __render_rows(
+    cache_file: Path, fingerprint: str, prompts: Iterator[Row]
+) -> Iterator[list[str]]:
+    """Render a year's sheet rows, caching them as they are rendered.
+
+    The fingerprint is written first, followed by one row per line,
+    so a year never needs to be held in memory all at once.
+    """
+    # Other workers could be reading the cache, so replace it all at once
+    temp_file = cache_file.with_name(f".{cache_file.name}.{token_hex(4)}.tmp")
     try:
-        temp_file = save_dir / "perm.temp"
-        temp_file.write_bytes(b"")
-        temp_file.unlink()
-    except PermissionError:
-        return None
+        with temp_file.open("w", encoding="utf-8") as f:
+            f.write(json.dumps(fingerprint) + "\n")
+            for prompt in prompts:
+                row = [
+                    prompt.date.isoformat(),
+                    prompt.word,
+                    prompt.handle,
+                    prompt.url,
+                    prompt.content.replace("\n", " "),
+                ]
+                f.write(json.dumps(row) + "\n")
+                yield row
+        temp_file.replace(cache_file)
+    finally:
+        temp_file.unlink(missing_ok=True)
 
-    # Set up all of the date values we need
-    today = date.today()
-    all_prompt_years = prompts.get_years()
-    year_range = __get_prompt_date_range()
 
-    # Put together the archive's file name
-    file_name = f"{FILE_NAME_BASE}{today.isoformat()}{FILE_NAME_EXT}"
-    full_save_path = save_dir / file_name
+def __get_prompts(years: list[int]) -> Iterator[tuple[int, Iterator[Row]]]:
+    """Stream all relevant Prompt information for the given years of the archive.
 
-    # Create a new spreadsheet file
-    workbook_config = {"constant_memory": True, "default_date_format": "yyyy-mm-dd"}
-    with xlsxwriter.Workbook(full_save_path, workbook_config) as workbook:
+    The Prompts are ordered by year, then by word, so each year's sheet
+    can be written in a single pass. Rows are fetched from the database
+    in batches as they are needed rather than all at once.
+    """
+    if not years:
+        return iter(())
+
+    year = extract("year", Prompt.date).label("year")
+    qs = (
+        __select_prompts()
+        .add_columns(year)
+        .filter(
+            or_(*(
+                and_(Prompt.date >= start, Prompt.date < end)
+                for start, end in map(year_range, years)
+            ))
+        )
+        .order_by(year, Prompt.word)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    return groupby(db.session.execute(qs), key=lambda prompt: int(prompt.year))
+
+
+def __write_workbook(
+    path: Path,
+    config: dict,
+    today: date,
+    prompt_range: Row,
+    fingerprints: dict[int, str],
+    progress: Callable[[int], None] | None,
+) -> None:
+    """Write the archive spreadsheet, one sheet per year."""
+    # Past years almost never change, so only the years whose Prompts
+    # changed since they were last rendered are read from the database
+    cache_dir = __cache_dir()
+    cache_files = {year: cache_dir / f"{year}.jsonl" for year in fingerprints}
+    uncached = [
+        year
+        for year, fingerprint in fingerprints.items()
+        if __cached_fingerprint(cache_files[year]) != fingerprint
+    ]
+    streamed = __get_prompts(uncached)
+    pending = next(streamed, None)
+
+    with xlsxwriter.Workbook(path, config) as workbook:
         # Create a bold text formatter
         bolded_text = workbook.add_format()
         bolded_text.set_bold()
@@ -94,8 +348,8 @@ def create() -> str | None:
             0,
             0,
             "#vss365 prompt archive from {} to {}".format(
-                format_datetime_pretty(year_range.oldest),
-                format_datetime_pretty(year_range.newest),
+                format_datetime_pretty(prompt_range.oldest),
+                format_datetime_pretty(prompt_range.newest),
             ),
         )
         worksheet.write(1, 0, "Sorted by prompt in alphabetical order")
@@ -103,17 +357,10 @@ def create() -> str | None:
         worksheet.write_url(3, 0, "https://vss365today.com")
 
         # Group each year's prompts in their own sheet
-        for year in all_prompt_years:
+        written = 0
+        for year, fingerprint in fingerprints.items():
             worksheet = workbook.add_worksheet(str(year))
 
-            # Set the column widths
-            widths = __get_column_widths(year)
-            worksheet.set_column(0, 0, 10)
-            worksheet.set_column(1, 1, widths.longest_word)
-            worksheet.set_column(2, 2, widths.longest_handle)
-            worksheet.set_column(3, 3, widths.longest_url)
-            worksheet.set_column(4, 1, 50)
-
             # Write the headings
             worksheet.write(0, 0, "Date", bolded_text)
             worksheet.write(0, 1, "Prompt", bolded_text)
@@ -121,26 +368,226 @@ def create() -> str | None:
             worksheet.write(0, 3, "URL", bolded_text)
             worksheet.write(0, 4, "Content", bolded_text)
 
-            # Get the prompt archive for the current year.
-            # Rows are zero-indexed, meaning we need to start at 1
-            # so we don't clobber the headings
-            for row, prompt in enumerate(__get_prompts_by_year(year), start=1):
-                worksheet.write_datetime(row, 0, prompt.date)
-                worksheet.write(row, 1, prompt.word)
-                worksheet.write(row, 2, prompt.handle)
-                worksheet.write_url(row, 3, prompt.url)
-                worksheet.write(row, 4, prompt.content.replace("\n", " "))
+            # Write the prompt archive for the current year, keeping track of
+            # the longest values as we go. Rows are zero-indexed, meaning
+            # we need to start at 1 so we don't clobber the headings
+            longest_word, longest_handle, longest_url = 0, 0, 0
+            if year not in uncached:
+                rows = __read_rows(cache_files[year])
+            elif pending is not None and pending[0] == year:
+                rows = __render_rows(cache_files[year], fingerprint, pending[1])
+            else:
+                rows = iter(())
+            for row, (prompt_date, word, handle, url, content) in enumerate(
+                rows, start=1
+            ):
+                worksheet.write_datetime(row, 0, date.fromisoformat(prompt_date))
+                worksheet.write(row, 1, word)
+                worksheet.write(row, 2, handle)
+                worksheet.write_url(row, 3, url)
+                worksheet.write(row, 4, content)
+                longest_word = max(longest_word, len(word))
+                longest_handle = max(longest_handle, len(handle))
+                longest_url = max(longest_url, len(url))
+
+                written += 1
+                if progress is not None and written % BATCH_SIZE == 0:
+                    progress(written)
+
+            # Set the column widths. Even when streaming the rows,
+            # the widths are only saved once the whole sheet is done
+            worksheet.set_column(0, 0, 10)
+            worksheet.set_column(1, 1, longest_word + 2)
+            worksheet.set_column(2, 2, longest_handle + 2)
+            worksheet.set_column(3, 3, longest_url + 1)
+            worksheet.set_column(4, 4, 50)
+
+            # The year's rows have all been read, so move on to the next year
+            if year in uncached and pending is not None and pending[0] == year:
+                pending = next(streamed, None)
+
+    # Years that no longer have any Prompts don't need to be kept around
+    for cache_file in cache_dir.glob("*.jsonl"):
+        if cache_file not in cache_files.values():
+            cache_file.unlink(missing_ok=True)
+
+
+def __export_batches() -> Iterator[Sequence[Row]]:
+    """Stream every released Prompt, oldest first, a batch at a time.
+
+    Exports are public, so unlike the spreadsheet archive,
+    they never include the Prompts that are yet to be released.
+    """
+    qs = (
+        __select_prompts()
+        .filter(Prompt.date <= date.today())
+        .order_by(Prompt.date)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    yield from db.session.execute(qs).partitions()
+
+
+def __export_csv() -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(__select_prompts().selected_columns.keys())
+    yield buffer.getvalue().encode("utf-8")
+
+    for batch in __export_batches():
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def __export_jsonl() -> Iterator[bytes]:
+    for batch in __export_batches():
+        yield "".join(
+            json.dumps(
+                {**prompt._asdict(), "date": prompt.date.isoformat()},
+                ensure_ascii=False,
+            )
+            + "\n"
+            for prompt in batch
+        ).encode("utf-8")
+
+
+class _ParquetSink(io.RawIOBase):
+    """A write-only file that hands over everything written to it so far.
+
+    Parquet records where everything is in the file, so the sink
+    needs to know its position even after its contents are handed over.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        self.position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def __export_parquet() -> Iterator[bytes]:
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("word", pa.string()),
+        ("handle", pa.string()),
+        ("url", pa.string()),
+        ("content", pa.string()),
+    ])
+
+    # Each batch becomes its own row group, so it can be sent along right away
+    sink = _ParquetSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in __export_batches():
+            writer.write_table(
+                pa.Table.from_pylist([prompt._asdict() for prompt in batch], schema)
+            )
+            yield sink.drain()
+    yield sink.drain()
+
+
+def count() -> int:
+    """Count the Prompts that will be written to the archive."""
+    qs = db.select(func.count(Prompt._id)).filter(__archived_prompts())
+    return db.session.execute(qs).scalar_one()
+
+
+def create(progress: Callable[[int], None] | None = None) -> str | None:
+    """Generate a new Prompt archive.
+
+    If given, `progress` is told the number of Prompts written as it goes.
+    """
+    # Check that we have permission to write to the save directory
+    save_dir = __save_dir()
+    try:
+        temp_file = save_dir / "perm.temp"
+        temp_file.write_bytes(b"")
+        temp_file.unlink()
+    except PermissionError:
+        return None
+
+    # Set up all of the date values we need
+    today = date.today()
+    year_range = __get_prompt_date_range()
+
+    # Put together the archive's file name. The archive is written under a
+    # temporary name first so a half-written archive is never picked up
+    file_name = f"{FILE_NAME_BASE}{today.isoformat()}{FILE_NAME_EXT}"
+    temp_save_path = save_dir / f".{file_name}.{token_hex(4)}.tmp"
+
+    # Create a new spreadsheet file
+    workbook_config = {"constant_memory": True, "default_date_format": "yyyy-mm-dd"}
+    try:
+        __write_workbook(
+            temp_save_path,
+            workbook_config,
+            today,
+            year_range,
+            __fingerprints(),
+            progress,
+        )
+
+    # Don't leave a half-written archive lying around
+    except Exception:
+        temp_save_path.unlink(missing_ok=True)
+        raise
+
+    # Now that the archive is complete, publish it all at once
+    __publish(save_dir, temp_save_path, file_name)
+
+    # A new archive isn't a database change, so tell the workers about it ourselves
+    generation.bump()
     return file_name
 
 
-def current() -> str | None:
-    """Get the newest generated archive file."""
-    # Sort the available files by created time, with newest on top,
-    # and return the first one if we have any
-    save_dir = Path(get_secret("DOWNLOADS_DIR")).resolve()
-    all_files = sorted(
-        save_dir.glob(f"*{FILE_NAME_EXT}"),
-        key=lambda f: f.stat().st_ctime,
-        reverse=True,
+def export(file_format: str) -> Export | None:
+    """Stream every released Prompt in a machine-friendly format.
+
+    Unlike the spreadsheet archive, exports are streamed right from
+    the database and are never saved. If the format is not available,
+    nothing is provided.
+    """
+    exporters = {"csv": __export_csv, "jsonl": __export_jsonl}
+    if pa is not None:
+        exporters["parquet"] = __export_parquet
+    if file_format not in exporters:
+        return None
+
+    return Export(
+        f"{FILE_NAME_BASE}{date.today().isoformat()}.{file_format}",
+        EXPORT_FORMATS[file_format],
+        exporters[file_format](),
     )
-    return all_files[0].name if all_files else None
+
+
+def current() -> ArchiveFile | None:
+    """Get the newest published archive."""
+    archives = __read_manifest(__save_dir())
+    return archives[0] if archives else None
+
+
+def get(file_name: str) -> ArchiveFile | None:
+    """Get a published archive."""
+    for archive in __read_manifest(__save_dir()):
+        if archive["file_name"] == file_name:
+            return archive
+    return None
+
+
+def path(archive: ArchiveFile) -> Path:
+    """Get the location of a published archive."""
+    return __save_dir() / archive["file_name"]
@@ -0,0 +1,121 @@
+from datetime import date
+
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.engine.row import Row
+from sqlalchemy.sql import ColumnElement, case, func
+
+from src.core.database import read_model
+from src.core.database.models import Prompt, PromptCalendar, db
+from src.core.helpers import month_range
+
+
+__all__ = ["months", "rebuild", "refresh", "years"]
+
+
+def __released_total() -> ColumnElement[int]:
+    """Count the Prompts in a calendar month that have been released.
+
+    A month still being given out is counted from the Prompts themselves,
+    so the number of Prompts queued up for the rest of the month isn't exposed.
+    """
+    today = date.today()
+    released = (
+        db.select(func.count(Prompt._id))
+        .filter(Prompt.date >= PromptCalendar.first_date, Prompt.date <= today)
+        .scalar_subquery()
+    )
+    return case(
+        (PromptCalendar.last_date <= today, PromptCalendar.prompt_count),
+        else_=released,
+    )
+
+
+def months(year: int) -> list[Row] | list[read_model.MonthTotal]:
+    """Get the months and number of Prompts recorded in the given year."""
+    if read_model.enabled():
+        return read_model.snapshot().months(year)
+
+    # Be sure to filter out any future, as of yet unreleased, Prompt months
+    qs = (
+        db.select(PromptCalendar.month, __released_total().label("total"))
+        .filter(
+            PromptCalendar.year == year,
+            PromptCalendar.first_date <= date.today(),
+        )
+        .order_by(PromptCalendar.month)
+    )
+    return db.session.execute(qs).all()
+
+
+def rebuild() -> int:
+    """Rebuild the entire Prompt calendar from the recorded Prompts.
+
+    This is only needed to backfill the calendar, as every Prompt change
+    keeps the affected months up to date on its own.
+    """
+    qs = (
+        db.select(
+            func.year(Prompt.date).label("year"),
+            func.month(Prompt.date).label("month"),
+            func.count(Prompt._id).label("prompt_count"),
+            func.min(Prompt.date).label("first_date"),
+            func.max(Prompt.date).label("last_date"),
+        )
+        .group_by(func.year(Prompt.date), func.month(Prompt.date))
+        .order_by(func.year(Prompt.date), func.month(Prompt.date))
+    )
+    summaries = db.session.execute(qs).all()
+
+    # Replace the whole calendar in a single transaction so it is never half-built
+    db.session.execute(db.delete(PromptCalendar))
+    db.session.add_all(PromptCalendar(**row._asdict()) for row in summaries)
+    db.session.commit()
+    return len(summaries)
+
+
+def refresh(*dates: date) -> None:
+    """Recalculate the calendar months for the given Prompt dates.
+
+    This does not commit the changes, letting it be part
+    of the same transaction as the Prompt change itself.
+    """
+    for year, month in {(d.year, d.month) for d in dates}:
+        start, end = month_range(year, month)
+        qs = db.select(
+            func.count(Prompt._id).label("prompt_count"),
+            func.min(Prompt.date).label("first_date"),
+            func.max(Prompt.date).label("last_date"),
+        ).filter(Prompt.date >= start, Prompt.date < end)
+        summary = db.session.execute(qs).one()
+
+        # There are no more Prompts in this month, so it should not be browsable
+        if not summary.prompt_count:
+            qs = db.delete(PromptCalendar).filter_by(year=year, month=month)
+            db.session.execute(qs)
+            continue
+
+        # Another Prompt change may be recording the same new month at the same time
+        qs = insert(PromptCalendar.__table__).values(
+            year=year, month=month, **summary._asdict()
+        )
+        db.session.execute(
+            qs.on_duplicate_key_update(
+                {name: qs.inserted[name] for name in summary._fields}
+            )
+        )
+    return None
+
+
+def years() -> list[Row] | list[read_model.YearTotal]:
+    """Get the years and number of Prompts recorded in each year."""
+    if read_model.enabled():
+        return read_model.snapshot().years()
+
+    # Be sure to filter out any future, as of yet unreleased, Prompt months
+    qs = (
+        db.select(PromptCalendar.year, func.sum(__released_total()).label("total"))
+        .filter(PromptCalendar.first_date <= date.today())
+        .group_by(PromptCalendar.year)
+        .order_by(PromptCalendar.year)
+    )
+    return db.session.execute(qs).all()
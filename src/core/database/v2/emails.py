@@ -1,10 +1,18 @@
 from flask import current_app
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError, SQLAlchemyError
 
 from src.core.database.models import Email, db
 
 
-__all__ = ["create", "delete", "get_all", "get_emails_totalling"]
+__all__ = [
+    "create",
+    "create_many",
+    "delete",
+    "delete_many",
+    "get_all",
+    "get_emails_totalling",
+]
 
 
 def create(address: str) -> bool:
@@ -22,6 +30,54 @@ def create(address: str) -> bool:
         return False
 
 
+def create_many(addresses: list[str]) -> list[str] | None:
+    """Add email addresses all at once, skipping any that were already added.
+
+    Like the database, addresses are compared without regard to case. Every
+    address is added in a single statement and transaction. The addresses
+    that were newly added are provided, or nothing at all if the addresses
+    could not be added.
+    """
+    # The same address could be given more than once, even in different cases
+    addresses = list({address.casefold(): address for address in addresses}.values())
+    if not addresses:
+        return []
+
+    try:
+        # Lock the addresses, even the ones that don't exist yet, so no one else
+        # can add them before we're done and we know exactly what we added
+        qs = (
+            db.select(Email.address)
+            .filter(Email.address.in_(addresses))
+            .with_for_update()
+        )
+        existing = {address.casefold() for address in db.session.execute(qs).scalars()}
+        added = [address for address in addresses if address.casefold() not in existing]
+
+        if added:
+            qs = insert(Email.__table__).values([{"email": addr} for addr in added])
+            db.session.execute(
+                qs.on_duplicate_key_update(email=Email.__table__.c.email)
+            )
+
+            # The database can consider even more addresses to be the same as we do,
+            # so only the addresses that were stored exactly as given were added
+            qs = db.select(Email.address).filter(
+                Email.address.collate("utf8mb4_bin").in_(added)
+            )
+            found = set(db.session.execute(qs).scalars().all())
+            added = [address for address in added if address in found]
+        db.session.commit()
+        current_app.logger.debug(f"{len(added)} emails added to mailing list.")
+        return added
+
+    # We hit some DB error
+    except (DBAPIError, SQLAlchemyError) as exc:
+        db.session.rollback()
+        current_app.log_exception(exc)
+        return None
+
+
 def delete(address: str) -> None:
     """Remove an email address."""
     qs = db.select(Email).filter_by(address=address)
@@ -32,6 +88,21 @@ def delete(address: str) -> None:
     return None
 
 
+def delete_many(addresses: list[str]) -> None:
+    """Remove email addresses all at once.
+
+    Only addresses written exactly as given are removed, so the same
+    address added by someone else in a different case is left alone.
+    """
+    if addresses:
+        db.session.execute(
+            db.delete(Email).filter(Email.address.collate("utf8mb4_bin").in_(addresses))
+        )
+        db.session.commit()
+    current_app.logger.debug(f"{len(addresses)} emails removed from subscription list.")
+    return None
+
+
 def get_all() -> list[Email]:
     """Get all email addresses."""
     return db.session.execute(db.select(Email).order_by(Email.address)).scalars().all()
@@ -3,10 +3,10 @@ from datetime import date
 from typing import TypedDict
 
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.sql import func
 
+from src.core.database import read_model
 from src.core.database.models import Host, HostDate, Prompt, db
-from src.core.helpers import twitter_v2_api
+from src.core.helpers import month_range, twitter_v2_api, year_range
 
 
 __all__ = [
@@ -104,7 +104,7 @@ def create_date(handle: str, date: date) -> bool:
     return True
 
 
-def current() -> Host | None:
+def current() -> Host | read_model.HostView | None:
     """Determine the current Host.
 
     If there is no Host recording for now, this will return None.
@@ -190,8 +190,11 @@ def delete_date(handle: str, given_date: date) -> bool:
     return True
 
 
-def get(handle: str) -> Host | None:
+def get(handle: str) -> Host | read_model.HostView | None:
     """Get an individual Host and all Hosting dates by a Twitter handle."""
+    if read_model.enabled():
+        return read_model.snapshot().host(handle)
+
     # Get the Host's info
     try:
         host = db.session.execute(db.select(Host).filter_by(handle=handle)).scalar_one()
@@ -204,19 +207,27 @@ def get(handle: str) -> Host | None:
     return host
 
 
-def get_all() -> list[Host]:
+def get_all() -> list[Host] | list[read_model.HostView]:
     """Get all recorded Hosts."""
+    if read_model.enabled():
+        return list(read_model.snapshot().hosts)
     return db.session.execute(db.select(Host)).scalars().all()
 
 
-def get_by_calendar_month(year: int, month: int) -> list[Host]:
+def get_by_calendar_month(
+    year: int, month: int
+) -> list[Host] | list[read_model.HostView]:
     """Get all the Hosts in a year-month combination."""
+    if read_model.enabled():
+        return read_model.snapshot().hosts_by_calendar_month(year, month)
+
+    start, end = month_range(year, month)
     qs = (
         db.select(Host)
         .join(HostDate)
         .filter(
-            func.year(HostDate.date) == year,
-            func.month(HostDate.date) == month,
+            HostDate.date >= start,
+            HostDate.date < end,
             HostDate.date <= date.today(),
         )
         .order_by(HostDate.date)
@@ -224,13 +235,16 @@ def get_by_calendar_month(year: int, month: int) -> list[Host]:
     return db.session.execute(qs).scalars().all()
 
 
-def get_by_date(date: date) -> Host | None:
+def get_by_date(date: date) -> Host | read_model.HostView | None:
     """Get the Host for the given date.
 
     Unlike Prompts, there are no recorded instances of two Hosts giving out
     two Prompts on the same day. As a result, this is a one-to-one mapping
     between the Hosting Date and the Host.
     """
+    if read_model.enabled():
+        return read_model.snapshot().host_by_date(date)
+
     try:
         return (
             db.session.execute(db.select(HostDate).filter_by(date=date))
@@ -241,12 +255,20 @@ def get_by_date(date: date) -> Host | None:
         return None
 
 
-def get_by_year(year: int) -> list[Host]:
+def get_by_year(year: int) -> list[Host] | list[read_model.HostView]:
     """Get a list of all Hosts for a given year."""
+    if read_model.enabled():
+        return read_model.snapshot().hosts_by_year(year)
+
+    start, end = year_range(year)
     qs = (
         db.select(Host)
         .join(HostDate)
-        .filter(func.year(HostDate.date) == year, HostDate.date <= date.today())
+        .filter(
+            HostDate.date >= start,
+            HostDate.date < end,
+            HostDate.date <= date.today(),
+        )
         .order_by(HostDate.date)
     )
     return db.session.execute(qs).scalars().all()
@@ -254,6 +276,9 @@ def get_by_year(year: int) -> list[Host]:
 
 def exists(handle: str) -> bool:
     """Determine if a Host has been recorded in the system."""
+    if read_model.enabled():
+        return read_model.snapshot().host_exists(handle)
+
     qs = db.select(Host._id).filter_by(handle=handle)
     return bool(db.session.execute(qs).first())
 
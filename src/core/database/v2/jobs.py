@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+
+from src.core.database.models import Job, db
+
+
+__all__ = [
+    "active",
+    "claim",
+    "create",
+    "fail",
+    "finish",
+    "get",
+    "latest",
+    "pending",
+    "progress",
+]
+
+
+def active(kind: str) -> Job | None:
+    """Get the oldest job of the given kind that is waiting or running."""
+    qs = (
+        db.select(Job)
+        .filter(Job.kind == kind, Job.status.in_(["queued", "running"]))
+        .order_by(Job._id)
+        .limit(1)
+    )
+    return db.session.execute(qs).scalar_one_or_none()
+
+
+def claim(job_id: int) -> Job | None:
+    """Mark a queued job as running, if no one else has already done so."""
+    # Only a single worker can ever switch the job out of the queue
+    qs = (
+        db.update(Job)
+        .where(Job._id == job_id, Job.status == "queued")
+        .values(status="running", date_updated=datetime.now())
+    )
+    if db.session.execute(qs).rowcount != 1:
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return db.session.get(Job, job_id)
+
+
+def create(kind: str, payload: dict, *, total: int = 0) -> Job:
+    """Queue a new job."""
+    job = Job(kind=kind, payload=payload, total=total)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def fail(job_id: int, error: str) -> None:
+    """Record a job as having failed."""
+    db.session.rollback()
+    if (job := db.session.get(Job, job_id)) is not None:
+        job.update_with({"status": "failed", "error": error[:1000]})
+        db.session.commit()
+    return None
+
+
+def finish(job_id: int, result: str | None = None) -> None:
+    """Record a job as having completed."""
+    # Progress is recorded outside of the session, so don't trust what it last saw
+    if (job := db.session.get(Job, job_id, populate_existing=True)) is not None:
+        job.update_with(
+            {"status": "done", "progress": job.total - job.failed, "result": result}
+        )
+        db.session.commit()
+    return None
+
+
+def get(job_id: int, kind: str) -> Job | None:
+    """Get a job of the given kind."""
+    return db.session.execute(
+        db.select(Job).filter_by(_id=job_id, kind=kind)
+    ).scalar_one_or_none()
+
+
+def latest(kind: str) -> Job | None:
+    """Get the newest job of the given kind, whatever its status."""
+    qs = db.select(Job).filter_by(kind=kind).order_by(Job._id.desc()).limit(1)
+    return db.session.execute(qs).scalar_one_or_none()
+
+
+def pending(stale_after: timedelta) -> list[int]:
+    """Get all jobs waiting to be run, oldest first.
+
+    Jobs that have been running for too long belonged to a worker
+    that has since gone away, so they are put back into the queue.
+    """
+    db.session.execute(
+        db.update(Job)
+        .where(
+            Job.status == "running",
+            Job.date_updated < datetime.now() - stale_after,
+        )
+        .values(status="queued")
+    )
+    db.session.commit()
+
+    qs = db.select(Job._id).filter_by(status="queued").order_by(Job._id)
+    return list(db.session.execute(qs).scalars().all())
+
+
+def progress(job_id: int, completed: int, failed: int = 0) -> None:
+    """Record how much of a job has been completed, and how much has failed.
+
+    Progress is recorded on its own connection, so reporting it never
+    commits the job's own transaction or cuts short any query it is
+    still reading from.
+    """
+    with db.engine.begin() as conn:
+        conn.execute(
+            db.update(Job)
+            .where(Job._id == job_id)
+            .values(progress=completed, failed=failed)
+        )
+    return None
@@ -1,5 +1,7 @@
 from secrets import token_hex
 
+from typing import Iterable
+
 from flask import current_app
 from sqlalchemy import inspect
 from sqlalchemy.exc import DataError, NoResultFound
@@ -8,6 +10,7 @@ from src.core.database.models import ApiKey, ApiKeyHistory, db
 
 
 __all__ = [
+    "PERMISSIONS",
     "available_permissions",
     "can_access",
     "create",
@@ -15,23 +18,33 @@ __all__ = [
     "exists",
     "get",
     "get_all",
+    "mask",
+    "permissions",
     "update",
 ]
 
 
+# Each permission's bit in a key's permission mask, in the order the permissions
+# are declared on the model. New permissions must only ever be added to the end
+PERMISSIONS: dict[str, int] = {
+    c.removeprefix("has_"): 1 << bit
+    for bit, c in enumerate(
+        c for c in inspect(ApiKey).columns.keys() if c.startswith("has_")
+    )
+}
+
+
 def available_permissions() -> list[str]:
     """List all permissions that can be used to protect an endpoint."""
-    return [
-        c.removeprefix("has_")
-        for c in inspect(ApiKey).columns.keys()
-        if c.startswith("has_")
-    ]
+    return list(PERMISSIONS)
 
 
-def can_access(token: str, perms: set) -> bool:
+def can_access(token: str, perms: Iterable[str]) -> bool:
     """Determine if the given API key has all permissions needed to access an endpoint."""
-    filters = [getattr(ApiKey, f"has_{perm}") == 1 for perm in perms]
-    qs = db.select(ApiKey).filter(*filters, ApiKey.token == token)
+    required = mask(perms)
+    qs = db.select(ApiKey._id).filter(
+        ApiKey.permissions.op("&")(required) == required, ApiKey.token == token
+    )
     try:
         db.session.execute(qs).scalar_one()
         return True
@@ -88,6 +101,21 @@ def get_all() -> list[ApiKey]:
     return db.session.execute(db.select(ApiKey).order_by(ApiKey._id)).scalars().all()
 
 
+def mask(perms: Iterable[str]) -> int:
+    """Combine permissions into a single permission mask."""
+    required = 0
+    for perm in perms:
+        required |= PERMISSIONS[perm]
+    return required
+
+
+def permissions(token: str) -> int | None:
+    """Get the permission mask of a key, if the key exists."""
+    return db.session.execute(
+        db.select(ApiKey.permissions).filter_by(token=token)
+    ).scalar_one_or_none()
+
+
 def update(data: dict) -> None:
     """Update a single key."""
     # Get the current key object
@@ -101,6 +129,7 @@ def update(data: dict) -> None:
     del original_info["desc"]
     del original_info["token"]
     del original_info["date_created"]
+    del original_info["permissions"]
     db.session.add(ApiKeyHistory(**original_info))
     current_app.logger.debug(
         f"API key {original_info['key_id']} former permissions archived."
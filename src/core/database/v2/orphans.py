@@ -0,0 +1,192 @@
+import fcntl
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Literal
+
+from sqlalchemy import or_
+
+from src.configuration import get_secret
+from src.core.database.models import PromptMedia, db
+from src.core.helpers import images
+
+
+__all__ = ["Stats", "collect"]
+
+
+# Files newer than this may still be part of an ingest that hasn't been recorded yet
+MIN_AGE = 60 * 60
+
+# Orphans are moved into this folder in the temporary directory when quarantined
+QUARANTINE_DIR = "quarantine"
+
+# Only one collection at a time, held in the quarantine folder so it's never collected
+LOCK_FILE = ".collect.lock"
+
+
+@dataclass
+class Stats:
+    scanned: int = 0
+    kept: int = 0
+    too_new: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    removed: int = 0
+    quarantined: int = 0
+
+
+def __variant_source(file: str) -> str | None:
+    """Get the name (without extension) of the media file an image variant is of."""
+    stem, label, ext = (file.rsplit(".", 2) + ["", ""])[:3]
+    if label in images.LABELS and ext in images.FORMATS:
+        return stem
+    return None
+
+
+def __referenced(files: list[str]) -> set[str]:
+    """Find which of the given media files are used by a Prompt Media.
+
+    An image variant is used for as long as the media file it was created
+    from is, so the files the variants were created from are looked up too.
+    Each column is looked up on its own so every lookup can use its index.
+    """
+    sources = {stem for file in files if (stem := __variant_source(file))}
+    by_file = db.select(PromptMedia.file).where(
+        or_(
+            PromptMedia.file.in_([*files, *sources]),
+            *(
+                PromptMedia.file.startswith(f"{stem}.", autoescape=True)
+                for stem in sources
+            ),
+        )
+    )
+    by_legacy_file = db.select(PromptMedia.legacy_file).where(
+        PromptMedia.legacy_file.in_(files)
+    )
+
+    used = set(db.session.execute(by_legacy_file).scalars().all())
+    for file in db.session.execute(by_file).scalars().all():
+        used.add(file)
+        used.update(images.variant_names(file))
+    return used.intersection(files)
+
+
+def __walk(root: Path, skip: Path | None = None) -> Iterator[os.DirEntry]:
+    """Walk through every file under a folder without listing it all at once."""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if skip is None or Path(entry.path) != skip:
+                    yield from __walk(Path(entry.path), skip)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def __batched(entries: Iterator[os.DirEntry], size: int) -> Iterator[list]:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def __collect(
+    temp_dir: Path,
+    *,
+    action: Literal["dry-run", "remove", "quarantine"],
+    batch_size: int,
+    min_age: int,
+) -> Stats:
+    stats = Stats()
+    images_dir = Path(get_secret("IMAGES_DIR")).resolve()
+    quarantine_dir = temp_dir / QUARANTINE_DIR / datetime.now().strftime("%Y%m%d%H%M%S")
+    cutoff = time.time() - min_age
+
+    for root, is_media_dir in ((images_dir, True), (temp_dir, False)):
+        entries = __walk(root, skip=temp_dir / QUARANTINE_DIR)
+        for batch in __batched(entries, batch_size):
+            files = {
+                Path(entry.path).relative_to(root).as_posix(): entry for entry in batch
+            }
+            referenced = __referenced(list(files)) if is_media_dir else set()
+
+            # Don't touch anything that could still be mid-ingest
+            candidates = []
+            for file, entry in files.items():
+                stats.scanned += 1
+                if file in referenced:
+                    stats.kept += 1
+                elif entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    stats.too_new += 1
+                else:
+                    candidates.append(file)
+
+            # Media can be used again while we were looking, so check the
+            # candidates again (in a new transaction, to see the latest records)
+            # right before touching them. Reusing a file also makes it new again
+            if is_media_dir and candidates:
+                db.session.rollback()
+                referenced = __referenced(candidates)
+            for file in candidates:
+                path = root / file
+                try:
+                    info = path.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if file in referenced:
+                    stats.kept += 1
+                    continue
+                if info.st_mtime > cutoff:
+                    stats.too_new += 1
+                    continue
+
+                stats.orphans += 1
+                stats.orphan_bytes += info.st_size
+                if action == "remove":
+                    path.unlink(missing_ok=True)
+                    stats.removed += 1
+                elif action == "quarantine":
+                    quarantined = quarantine_dir / root.name / file
+                    quarantined.parent.mkdir(parents=True, exist_ok=True)
+                    path.replace(quarantined)
+                    stats.quarantined += 1
+
+                # Clean up any shard folders we just emptied
+                if action != "dry-run" and is_media_dir:
+                    for parent in path.parents:
+                        if parent == images_dir:
+                            break
+                        try:
+                            parent.rmdir()
+                        except OSError:
+                            break
+    return stats
+
+
+def collect(
+    *,
+    action: Literal["dry-run", "remove", "quarantine"] = "dry-run",
+    batch_size: int = 1000,
+    min_age: int = MIN_AGE,
+) -> Stats:
+    """Find media files that no Prompt Media uses and clean them up.
+
+    Every file in the media directory is compared against the recorded
+    Prompt Media a batch at a time, and every file in the temporary
+    directory is only ever left over from a failed download. By default,
+    nothing is actually changed and only the statistics are reported.
+    A collection that is already running is waited on before starting.
+    """
+    temp_dir = Path(get_secret("IMAGES_DIR_TEMP")).resolve()
+    lock_path = temp_dir / QUARANTINE_DIR / LOCK_FILE
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return __collect(
+            temp_dir, action=action, batch_size=batch_size, min_age=min_age
+        )
@@ -1,21 +1,26 @@
-from datetime import date
-from typing import Literal, cast
+from datetime import date, timedelta
+from typing import Callable, cast
 
 from flask import current_app
 from sqlalchemy.engine.row import Row
 from sqlalchemy.exc import DBAPIError, NoResultFound, SQLAlchemyError
 from sqlalchemy.sql import func
+from sqlalchemy.types import Date
 
-from src.core.database.models import Host, Prompt, PromptMedia, db
-from src.core.database.v2 import hosts
-from src.core.helpers import media
+from src.core import search as search_engine
+from src.core.database.models import Host, Prompt, PromptMedia, PromptNavigation, db
+from src.core.database import read_model
+from src.core.database.v2 import calendar
+from src.core.helpers import images, media, month_range
 
 __all__ = [
     "create",
     "create_media",
+    "create_variants",
     "delete",
     "delete_media",
     "exists",
+    "exists_by_id",
     "exists_media",
     "get_by_date",
     "get_by_calendar_month",
@@ -28,16 +33,85 @@ __all__ = [
 ]
 
 
+def __load_navigation(prompts: list[Prompt]) -> list[Prompt]:
+    """Batch-load the previous/next Prompt dates for a list of Prompts.
+
+    Instead of running two queries for every Prompt during serialization,
+    the surrounding dates for all of the Prompts are calculated in a single query.
+    """
+    if not prompts:
+        return prompts
+
+    # Only the dates directly surrounding the given Prompts can ever be
+    # their navigation, so there's no need to look at the entire table
+    all_dates = {prompt.date for prompt in prompts}
+    dates = (
+        db.select(Prompt.date)
+        .filter(
+            Prompt.date >= min(all_dates) - timedelta(days=1),
+            Prompt.date <= max(all_dates) + timedelta(days=1),
+        )
+        .distinct()
+        .subquery()
+    )
+    window = {"order_by": dates.c.date}
+    qs = db.select(
+        dates.c.date,
+        func.lag(dates.c.date, type_=Date).over(**window).label("previous"),
+        func.lead(dates.c.date, type_=Date).over(**window).label("next"),
+    )
+
+    # The navigation only links to the directly surrounding days,
+    # so throw out any neighboring dates that are farther away
+    navigation: dict[date, PromptNavigation] = {}
+    for row in db.session.execute(qs).all():
+        navigation[row.date] = PromptNavigation(
+            previous=(
+                row.previous if row.previous == row.date - timedelta(days=1) else None
+            ),
+            next=row.next if row.next == row.date + timedelta(days=1) else None,
+        )
+
+    for prompt in prompts:
+        prompt.navigation = navigation[prompt.date]
+    return prompts
+
+
+def __get_host(handle: str) -> Host | None:
+    """Get the Host record to associate with a Prompt."""
+    qs = db.select(Host).filter_by(handle=handle)
+    return db.session.execute(qs).scalars().first()
+
+
+def __known_media(urls: list[str]) -> dict[str, PromptMedia]:
+    """Find the stored media previously downloaded from any of the given URLs."""
+    qs = (
+        db.select(PromptMedia)
+        .where(
+            PromptMedia.source_url.in_(urls),
+            PromptMedia.source_etag.is_not(None),
+            PromptMedia.sha256.is_not(None),
+        )
+        .order_by(PromptMedia._id)
+    )
+
+    # Only the newest copy of each URL is needed,
+    # and only if we still actually have the file
+    known = {pm.source_url: pm for pm in db.session.execute(qs).scalars().all()}
+    return {url: pm for url, pm in known.items() if media.exists(cast(str, pm.file))}
+
+
 def create(info: dict) -> Prompt | None:
     """Create a new Prompt."""
     # Get the Host who gave out this Prompt
-    host = hosts.get(info.pop("host_handle"))
+    host = __get_host(info.pop("host_handle"))
     if host is None:
         return None
 
     # Create the Prompt itself
     prompt = Prompt(host=host, **info)
     db.session.add(prompt)
+    calendar.refresh(prompt.date)
 
     # Now that we have everything created, provide the caller
     # with the full Prompt context and info
@@ -45,7 +119,11 @@ def create(info: dict) -> Prompt | None:
     return prompt
 
 
-def create_media(prompt_id: int, media_info: list[dict]) -> bool:
+def create_media(
+    prompt_id: int,
+    media_info: list[dict],
+    progress: Callable[[int, int], None] | None = None,
+) -> bool:
     """Create media files and records for an associated Prompt."""
     # Start by filtering out all media items with invalid URLs.
     # It's ok if invalid media URLs are silently discarded
@@ -56,46 +134,80 @@ def create_media(prompt_id: int, media_info: list[dict]) -> bool:
     if not media_info:
         return True
 
-    # If there are any valid media URLs, create a record
-    # that associates them with the given Prompt
-    # TODO: Maybe initially create the db record w/o the url
-    # then update it after we have the file name
-    media_recorded = []
-    for item in media_info:
-        pm = PromptMedia(
-            prompt_id=prompt_id,
-            alt_text=item["alt_text"],
-            file=item["url"],
-        )
-        db.session.add(pm)
-        db.session.flush()
-        media_recorded.append(pm)
-
-    media_saved = []
-    for item in media_recorded:
-        # Download the media to its final resting place
-        temp_file = media.download(item.file)
-        final_file = media.saved_name(prompt_id, item._id, item.file)
-        save_result = media.move(temp_file, final_file)
-        media_saved.append(save_result)
-
-        # After it is downloaded, we need to update the database record
-        # with the proper  media URL. This is a little bit of a chicken
-        # and egg problem. We want to save the media file with the media ID,
-        # but to get it, we need to save the media to the database first.
-        # Oh well ¯\_(ツ)_/¯
-        item.file = final_file
-
-    # If all of the media saved successfully, we can write everything to the database
-    if all(media_saved):
+    # Download all of the media at the same time before touching the database.
+    # Media we have downloaded before is only downloaded again if it changed.
+    # If any one of them can't be downloaded, none of them are kept
+    urls = [item["url"] for item in media_info]
+    known = __known_media(urls)
+    etags = [known[url].source_etag if url in known else None for url in urls]
+    if (downloads := media.download_all(urls, progress, etags)) is None:
+        return False
+
+    # Store each file and create a record that associates it with the given Prompt.
+    # Files are named after their contents, so duplicate media is only stored once
+    try:
+        for item, download in zip(media_info, downloads):
+            if download.file is None:
+                file, sha256 = known[download.url].file, known[download.url].sha256
+                media.touch(cast(str, file))
+            else:
+                file, sha256 = media.store(download), download.sha256
+
+            pm = PromptMedia(
+                prompt_id=prompt_id,
+                alt_text=item["alt_text"],
+                file=file,
+                sha256=sha256,
+                source_url=download.url,
+                source_etag=download.etag,
+            )
+            db.session.add(pm)
         db.session.commit()
         return True
 
-    # But if all of the media *didn't* save correctly, we need to remove all of them
-    # so there's no orphan records
-    db.session.rollback()
-    media.delete(prompt_id)
-    return False
+    # Any files we already stored are left for the media garbage collection
+    except (DBAPIError, SQLAlchemyError, OSError) as exc:
+        current_app.logger.exception(exc)
+        db.session.rollback()
+        return False
+
+    # Don't leave behind any downloads we didn't get to
+    finally:
+        media.discard(*downloads)
+
+
+def create_variants(prompt_id: int) -> bool:
+    """Create the image variants for any of a Prompt's media without them."""
+    qs = db.select(PromptMedia).where(
+        PromptMedia.prompt_id == prompt_id,
+        PromptMedia.file.is_not(None),
+        PromptMedia.variants.is_(None),
+    )
+    if not (pending := db.session.execute(qs).scalars().all()):
+        return True
+
+    # Media with the same file can share the variants that already exist
+    files = {cast(str, pm.file) for pm in pending}
+    qs = db.select(PromptMedia).where(
+        PromptMedia.file.in_(files), PromptMedia.variants.is_not(None)
+    )
+    existing = {pm.file: pm for pm in db.session.execute(qs).scalars().all()}
+    to_render = sorted(files - existing.keys())
+    rendered = dict(zip(to_render, images.create_variants(to_render)))
+
+    for pm in pending:
+        if (done := existing.get(pm.file)) is not None:
+            pm.update_with(
+                {"width": done.width, "height": done.height, "variants": done.variants}
+            )
+
+        # Media that isn't an image (such as a video) doesn't get any variants
+        elif (info := rendered[pm.file]) is None:
+            pm.variants = {}
+        else:
+            pm.update_with(dict(info))
+    db.session.commit()
+    return True
 
 
 def delete(prompt_id: int) -> bool:
@@ -104,6 +216,8 @@ def delete(prompt_id: int) -> bool:
     This will fail if the given Prompt does not exist.
 
     A database FK constraint will ensure any associated media records is also deleted.
+    Stored media files are shared, so they are removed by the media garbage collection
+    once nothing uses them.
     """
     # We can't delete a Prompt that does not exist
     try:
@@ -112,10 +226,12 @@ def delete(prompt_id: int) -> bool:
     except NoResultFound:
         return False
 
-    # Delete the Prompt and any associated Media records and files
+    # Delete the Prompt and any associated Media records and legacy links
+    legacy_files = [pm.legacy_file for pm in prompt.media if pm.legacy_file]
     db.session.delete(prompt)
+    calendar.refresh(prompt.date)
     db.session.commit()
-    media.delete(prompt_id)
+    media.remove(*legacy_files)
     return True
 
 
@@ -128,10 +244,13 @@ def delete_media(info: dict) -> bool:
     except NoResultFound:
         return False
 
-    # Delete the Prompt and any associated Media records and files
+    # Delete the Media record and its legacy link. The stored file
+    # may be shared, so it's left for the media garbage collection
+    legacy_file = pm.legacy_file
     db.session.delete(pm)
     db.session.commit()
-    media.delete(info["id"], info["media_id"])
+    if legacy_file:
+        media.remove(legacy_file)
     return True
 
 
@@ -143,37 +262,55 @@ def exists(prompt_date: date) -> bool:
     return bool(db.session.execute(qs).first())
 
 
+def exists_by_id(prompt_id: int) -> bool:
+    """Determine if a Prompt with this ID exists."""
+    qs = db.select(Prompt._id).filter_by(_id=prompt_id)
+    return bool(db.session.execute(qs).first())
+
+
 def exists_media(media_id: int) -> bool:
     """Determine if a Prompt Media with this ID exists."""
     qs = db.select(PromptMedia._id).filter_by(_id=media_id)
     return bool(db.session.execute(qs).first())
 
 
-def get_by_date(prompt_date: date) -> list[Prompt]:
+def get_by_date(prompt_date: date) -> list[Prompt] | list[read_model.PromptView]:
     """Get all of the Prompts for this date."""
+    if read_model.enabled():
+        return read_model.snapshot().prompts_by_date(prompt_date)
+
     # Don't expose tomorrow's (or next week's) Prompt
     qs = db.select(Prompt).filter(
         Prompt.date == prompt_date, Prompt.date <= date.today()
     )
-    return db.session.execute(qs).scalars().all()
+    return __load_navigation(db.session.execute(qs).scalars().all())
 
 
-def get_by_calendar_month(year: int, month: int) -> list[Prompt]:
+def get_by_calendar_month(
+    year: int, month: int
+) -> list[Prompt] | list[read_model.PromptView]:
     """Get all of the Prompts in a calendar month."""
+    if read_model.enabled():
+        return read_model.snapshot().prompts_by_calendar_month(year, month)
+
+    start, end = month_range(year, month)
     qs = (
         db.select(Prompt)
         .filter(
-            func.year(Prompt.date) == year,
-            func.month(Prompt.date) == month,
+            Prompt.date >= start,
+            Prompt.date < end,
             Prompt.date <= date.today(),
         )
         .order_by(Prompt.date)
     )
-    return db.session.execute(qs).scalars().all()
+    return __load_navigation(db.session.execute(qs).scalars().all())
 
 
-def get_by_host(handle: str) -> list[Row]:
+def get_by_host(handle: str) -> list[Row] | list[read_model.PromptView]:
     """Get a Prompt by the Host who give it."""
+    if read_model.enabled():
+        return read_model.snapshot().prompts_by_host(handle)
+
     today = date.today()
     qs = (
         db.select(Prompt.date, Prompt.word, Host.handle)
@@ -184,8 +321,11 @@ def get_by_host(handle: str) -> list[Row]:
     return db.session.execute(qs).all()
 
 
-def get_current() -> list[Prompt]:
+def get_current() -> list[Prompt] | list[read_model.PromptView]:
     """Get the current Prompt."""
+    if read_model.enabled():
+        return read_model.snapshot().prompts_current()
+
     # Start by determining the newest recorded Prompt date that's also not in the future
     qs = db.select(Prompt.date).order_by(Prompt.date.desc())
     newest_date = db.session.execute(qs).scalar()
@@ -198,7 +338,7 @@ def get_current() -> list[Prompt]:
     # `get_by_date` method here because we don't need to restrict ourselves
     # from pulling today's Prompt, as that would do
     qs = db.select(Prompt).filter_by(date=newest_date)
-    return db.session.execute(qs).scalars().all()
+    return __load_navigation(db.session.execute(qs).scalars().all())
 
 
 def get_months(year: int) -> list[int]:
@@ -210,43 +350,30 @@ def get_months(year: int) -> list[int]:
     we need a unique month list in order to correctly display
     the year browsing page.
     """
-    # Be sure to filter out any future, as of yet unreleased, Prompt years
-    current_year = date.today().year
-    qs = (
-        db.select(func.month(Prompt.date))
-        .filter(
-            func.year(Prompt.date) == year,
-            func.year(Prompt.date) <= current_year,
-        )
-        .distinct()
-        .order_by(Prompt.date)
-    )
-    return db.session.execute(qs).scalars().all()
+    return [row.month for row in calendar.months(year)]
 
 
 def get_years() -> list[int]:
     """Get a list of years of recorded Prompts."""
-    # Be sure to filter out any future, as of yet unreleased, Prompt years
-    current_year = date.today().year
-    qs = (
-        db.select(func.year(Prompt.date))
-        .filter(func.year(Prompt.date) <= current_year)
-        .distinct()
-        .order_by(Prompt.date)
-    )
-    return [year[0] for year in db.session.execute(qs).all()]
+    return [row.year for row in calendar.years()]
 
 
-def search(query: str) -> list[Row]:
-    """Search through Prompts words with an arbitrary query."""
-    today = date.today()
-    qs = (
-        db.select(Prompt.date, Prompt.word, Host.handle)
-        .join(Host)
-        .filter(Prompt.date <= today, Prompt.word.like(f"%{query}%"), len(query) > 1)
-        .order_by(func.upper(Prompt.word))
-    )
-    return db.session.execute(qs).all()
+def search(
+    query: str, *, limit: int | None, after: search_engine.Cursor | None = None
+) -> search_engine.SearchResults:
+    """Search through Prompts words and content with an arbitrary query.
+
+    Results are ranked by relevance and paginated using the cursor
+    given out with the previous page of results. Without a `limit`,
+    every match is given in alphabetical order instead.
+
+    Searches always go to the configured search backend, even when
+    the read model is answering the other public reads.
+    """
+    results = search_engine.search(query, limit=limit, after=after)
+    if limit is None:
+        results.prompts.sort(key=lambda hit: (hit.word.upper(), hit.date))
+    return results
 
 
 def update(info: dict) -> bool:
@@ -261,7 +388,7 @@ def update(info: dict) -> bool:
     # If a Host handle if given, we assume we want to change the Prompt association
     if (host_handle := info.pop("host_handle", None)) is not None:
         # That Host doesn't exist in the system, we can't continue on
-        if (new_host := hosts.get(host_handle)) is None:
+        if (new_host := __get_host(host_handle)) is None:
             return False
 
         # The given prompt Host is different from the recorded Host.
@@ -270,21 +397,24 @@ def update(info: dict) -> bool:
         if prompt.host != new_host:
             info["host_id"] = new_host._id
 
-    # Finally, save the updated Prompt
+    # Finally, save the updated Prompt, making sure to also
+    # update the calendar for both the old and new Prompt date
     del info["id"]
+    old_date = prompt.date
     prompt.update_with(info)
+    calendar.refresh(old_date, prompt.date)
     db.session.commit()
     return True
 
 
-def update_media(prompt_id: int, media_info: list[dict]) -> Literal[True]:
+def update_media(prompt_id: int, media_info: list[dict]) -> bool:
     # Filter out provided media items that do not already exist.
-    # This is not the place to create new media items or invalid URLss
+    # This is not the place to create new media items or invalid URLs
     media_info = [
         item
         for item in media_info
-        if not exists_media(item["id"])
-        or not ("url" in item and media.is_valid_url(item["url"]))
+        if exists_media(item["id"])
+        and ("url" not in item or media.is_valid_url(item["url"]))
     ]
 
     # If there's no media to update, we should shortcut
@@ -292,33 +422,57 @@ def update_media(prompt_id: int, media_info: list[dict]) -> Literal[True]:
     if not media_info:
         return True
 
-    for item in media_info:
-        item_id = item.pop("id")
-
-        # Determine if a media URL was provided. If so, we need to
-        # download the new media file. However, we don't need to actually save the file in the final
-        # location yet, not until we get the database updated
-        if "url" in item:
-            temp_file = media.download(item["url"])
-            final_file = media.saved_name(prompt_id, item["id"], item["url"])
-            item["url"] = final_file
-
-        try:
-            # Update the db record with the new info
+    downloads, legacy_files = [], []
+    try:
+        for item in media_info:
             pm = db.session.execute(
-                db.select(PromptMedia).filter_by(_id=item_id)
-            ).scalar_one()
-            pm.update_with(item)
-            db.session.commit()
+                db.select(PromptMedia).filter_by(_id=item["id"], prompt_id=prompt_id)
+            ).scalar_one_or_none()
+            if pm is None:
+                continue
 
-            # Finally, remove the old media file and replace it with the new one
+            if "alt_text" in item:
+                pm.alt_text = item["alt_text"]
+
+            # Determine if a media URL was provided. If it's the same URL we got the
+            # current file from, we only need to download it again if it changed
             if "url" in item:
-                media.delete(prompt_id, item_id)
-                media.move(temp_file, final_file)
+                etag = pm.source_etag if item["url"] == pm.source_url else None
+                if (download := media.download(item["url"], etag)) is None:
+                    db.session.rollback()
+                    return False
+                downloads.append(download)
+
+                # Even if the file was downloaded, it is only
+                # replaced if the contents are actually different
+                if download.file is not None:
+                    if (file := media.store(download)) != pm.file:
+                        if pm.legacy_file:
+                            legacy_files.append(pm.legacy_file)
+                        pm.update_with({
+                            "file": file,
+                            "sha256": download.sha256,
+                            "legacy_file": None,
+                            "width": None,
+                            "height": None,
+                            "variants": None,
+                        })
+                pm.source_url = download.url
+                pm.source_etag = download.etag
+        db.session.commit()
 
-        # We had a DB level error, back off
-        except (DBAPIError, SQLAlchemyError) as exc:
-            current_app.log_exception(exc)
-            db.session.rollback()
-            return False
+    # We had a DB or file error, back off. Any files we already
+    # stored are left for the media garbage collection
+    except (DBAPIError, SQLAlchemyError, OSError) as exc:
+        current_app.log_exception(exc)
+        db.session.rollback()
+        return False
+
+    # Don't leave behind any downloads we didn't get to
+    finally:
+        media.discard(*downloads)
+
+    # Finally, remove the legacy links to any replaced media. The replaced
+    # files may be shared, so they are left for the media garbage collection
+    media.remove(*legacy_files)
     return True
@@ -1,10 +1,10 @@
 from json import dumps
 from typing import Any
 
-import httpx
 from flask import current_app, render_template
 
 from src.configuration import get_config, get_secret
+from src.core.email import mailgun
 from src.core.models.v2.EmailTemplate import EmailTemplate
 
 __all__ = ["batch_construct", "construct", "render", "send", "make_and_send"]
@@ -56,11 +56,10 @@ def send(email: dict[str, str]) -> bool:
     if not get_config("ENABLE_EMAIL_SENDING"):
         return True
 
-    # Attempt to send out the email
-    r = httpx.post(
-        f'https://api.mailgun.net/v3/{get_secret("MG_DOMAIN")}/messages',
-        auth=("api", get_secret("MG_API_KEY")),
-        data=email,
+    # Attempt to send out the email. Sending the same email twice
+    # is worse than not sending it, so only retry if it wasn't sent
+    r = mailgun.request(
+        "POST", f'/v3/{get_secret("MG_DOMAIN")}/messages', data=email, idempotent=False
     )
     r.raise_for_status()
     return True
@@ -1,17 +1,183 @@
 import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import cast
 
 import httpx
+from flask import current_app, g
 
 from src.configuration import get_config, get_secret
 
 __all__ = [
+    "MailgunUnavailable",
     "mailing_list",
     "create",
     "delete",
+    "request",
     "verify",
+    "verify_all",
 ]
 
 
+# Mailgun is having a problem or is asking us to slow down, so try again later
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Never wait longer than this between retries, no matter what Mailgun asks
+MAX_RETRY_DELAY = 10.0
+
+# The most mailing list members Mailgun accepts in a single request
+MEMBERS_PER_REQUEST = 1000
+
+
+class MailgunUnavailable(httpx.HTTPError):
+    """Mailgun has been failing, so requests aren't being sent for a while."""
+
+
+class _MailgunClient:
+    """Talk to Mailgun using a shared, pooled HTTP client.
+
+    Failed requests are retried with exponential backoff, but never past
+    the given deadline. After too many failures in a row, the circuit "opens"
+    and requests fail right away for a while instead of tying up a worker
+    waiting on Mailgun.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        retries: int,
+        backoff: float,
+        failure_threshold: int,
+        reset_after: float,
+    ) -> None:
+        self.client = httpx.Client(
+            base_url=base_url,
+            auth=("api", get_secret("MG_API_KEY")),
+            timeout=timeout,
+        )
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = Lock()
+
+    def __delay(self, attempt: int, response: httpx.Response | None) -> float:
+        """Work out how long to wait before the next attempt."""
+        # Mailgun may tell us exactly how long to wait
+        if response is not None and (
+            retry_after := response.headers.get("Retry-After")
+        ):
+            try:
+                return min(float(retry_after), MAX_RETRY_DELAY)
+            except ValueError:
+                pass
+
+        # Back off exponentially, with some jitter so workers don't retry in lockstep
+        delay = self.backoff * 2**attempt
+        return min(delay + random.uniform(0, delay), MAX_RETRY_DELAY)
+
+    def __record(self, succeeded: bool) -> None:
+        with self.lock:
+            if succeeded:
+                self.failures = 0
+                return None
+
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.reset_after
+        return None
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        deadline: float,
+        idempotent: bool = True,
+        **kwargs,
+    ) -> httpx.Response:
+        """Make a request to Mailgun, retrying it if it fails.
+
+        Requests that aren't safe to repeat (such as sending an email)
+        are only retried if Mailgun never got them or asked us to slow down.
+        Every attempt, and every wait between them, ends by the deadline.
+        """
+        if time.monotonic() < self.open_until:
+            raise MailgunUnavailable("Mailgun is currently unavailable.")
+        if (timeout := min(self.timeout, deadline - time.monotonic())) <= 0:
+            raise httpx.TimeoutException("Ran out of time to reach Mailgun.")
+
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            try:
+                response = self.client.request(method, url, timeout=timeout, **kwargs)
+                if response.status_code not in RETRY_STATUSES:
+                    self.__record(True)
+                    return response
+
+                # Mailgun asking us to slow down doesn't mean it's down
+                if response.status_code != 429:
+                    self.__record(False)
+                    if not idempotent:
+                        return response
+
+            except httpx.TransportError as exc:
+                self.__record(False)
+                never_sent = isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not (idempotent or never_sent):
+                    raise
+                error = exc
+
+            # Don't keep trying once the circuit opens or we would run out of time
+            delay = self.__delay(attempt, response)
+            if (
+                attempt == self.retries
+                or time.monotonic() < self.open_until
+                or time.monotonic() + delay >= deadline
+            ):
+                break
+            time.sleep(delay)
+            timeout = min(self.timeout, deadline - time.monotonic())
+
+        # We ran out of attempts, so give back Mailgun's last answer
+        if error is not None:
+            raise error
+        return cast(httpx.Response, response)
+
+
+def __client() -> _MailgunClient:
+    if (client := current_app.extensions.get("mailgun")) is None:
+        client = current_app.extensions.setdefault(
+            "mailgun",
+            _MailgunClient(
+                get_config("MG_API_URL"),
+                get_config("MG_TIMEOUT"),
+                get_config("MG_RETRIES"),
+                get_config("MG_RETRY_BACKOFF"),
+                get_config("MG_CIRCUIT_THRESHOLD"),
+                get_config("MG_CIRCUIT_RESET"),
+            ),
+        )
+    return client
+
+
+def __deadline() -> float:
+    """Get the time every Mailgun request for the current request must end by.
+
+    All of the Mailgun requests made for a single request share one deadline,
+    so retrying them can't keep the worker past its own timeout.
+    """
+    if "mailgun_deadline" not in g:
+        g.mailgun_deadline = time.monotonic() + get_config("MG_DEADLINE")
+    return g.mailgun_deadline
+
+
 def mailing_list() -> str:
     """Construct the Mailgun mailing list address."""
     # Construct the mailing list address. It is written this way
@@ -20,35 +186,77 @@ def mailing_list() -> str:
     return f'{get_config("MG_MAILING_LIST_ADDR")}@{get_secret("MG_DOMAIN")}'
 
 
-def create(addresses: list[str]) -> httpx.Response:
-    """Add a subscription email address."""
-    members = [{"subscribed": True, "address": address} for address in addresses]
-    return httpx.post(
-        f"https://api.mailgun.net/v3/lists/{mailing_list()}/members.json",
-        auth=("api", get_secret("MG_API_KEY")),
-        data={"upsert": True, "members": json.dumps(members)},
-    )
+def create(addresses: list[str]) -> bool:
+    """Add subscription email addresses.
+
+    Mailgun only accepts so many members at a time,
+    so large lists of addresses are added in pieces.
+    """
+    for start in range(0, len(addresses), MEMBERS_PER_REQUEST):
+        members = [
+            {"subscribed": True, "address": address}
+            for address in addresses[start : start + MEMBERS_PER_REQUEST]
+        ]
+        r = request(
+            "POST",
+            f"/v3/lists/{mailing_list()}/members.json",
+            data={"upsert": True, "members": json.dumps(members)},
+        )
+        if r.status_code != httpx.codes.OK:
+            return False
+    return True
 
 
 def delete(addr: str) -> httpx.Response:
     """Remove a subscription email address."""
-    return httpx.delete(
-        f"https://api.mailgun.net/v3/lists/{mailing_list()}/members/{addr}",
-        auth=("api", get_secret("MG_API_KEY")),
+    return request("DELETE", f"/v3/lists/{mailing_list()}/members/{addr}")
+
+
+def request(
+    method: str, url: str, *, idempotent: bool = True, **kwargs
+) -> httpx.Response:
+    """Make a request to the Mailgun API."""
+    return __client().request(
+        method, url, deadline=__deadline(), idempotent=idempotent, **kwargs
     )
 
 
+def __is_deliverable(client: _MailgunClient, addr: str, deadline: float) -> bool:
+    r = client.request(
+        "GET", "/v4/address/validate", deadline=deadline, params={"address": addr}
+    )
+
+    # Mailgun's last answer could be an error, which has no result to read
+    r.raise_for_status()
+
+    # The address can be added if it's marked as deliverable
+    return r.json()["result"] == "deliverable"
+
+
 def verify(addr: str) -> bool:
     """Validate an email address using the Mailgun Email Verification service."""
     # Assume the address is valid if we can't send out emails
     if not get_config("ENABLE_EMAIL_SENDING"):
         return True
+    return __is_deliverable(__client(), addr, __deadline())
 
-    r = httpx.get(
-        "https://api.mailgun.net/v4/address/validate",
-        auth=("api", get_secret("MG_API_KEY")),
-        params={"address": addr},
-    ).json()
 
-    # The address can be added if it's marked as deliverable
-    return r["result"] == "deliverable"
+def verify_all(addresses: list[str]) -> list[str]:
+    """Validate email addresses at the same time, providing any that failed.
+
+    Only a few addresses are validated at once
+    so we don't overwhelm the verification service.
+    """
+    # Assume the addresses are valid if we can't send out emails
+    if not get_config("ENABLE_EMAIL_SENDING") or not addresses:
+        return []
+
+    # The client and deadline must be fetched before handing the work off
+    # to the thread pool
+    client, deadline = __client(), __deadline()
+    workers = min(get_config("MG_VERIFY_WORKERS"), len(addresses))
+    with ThreadPoolExecutor(workers, thread_name_prefix="mailgun-verify") as pool:
+        deliverable = list(
+            pool.map(lambda addr: __is_deliverable(client, addr, deadline), addresses)
+        )
+    return [addr for addr, ok in zip(addresses, deliverable) if not ok]
@@ -1,11 +1,11 @@
-from datetime import date, datetime
+from datetime import MAXYEAR, MINYEAR, date, datetime
 
 import tweepy
 
 from src.configuration import get_secret
 
 
-__all__ = ["twitter_v2_api", "format_datetime_pretty"]
+__all__ = ["twitter_v2_api", "format_datetime_pretty", "month_range", "year_range"]
 
 
 def twitter_v2_api() -> tweepy.Client:
@@ -16,3 +16,33 @@ def twitter_v2_api() -> tweepy.Client:
 def format_datetime_pretty(date_obj: date | datetime) -> str:
     """Pretty format a date as MM DD, YYYY."""
     return date_obj.strftime("%B %d, %Y")
+
+
+def __first_of_month(year: int, month: int) -> date:
+    """Get the first day of a month, clamped to the dates that can be represented.
+
+    Years outside of what a date supports produce an empty range
+    rather than an error, the same as a year with no data.
+    """
+    if year < MINYEAR:
+        return date.min
+    if year > MAXYEAR:
+        return date.max
+    return date(year, month, 1)
+
+
+def month_range(year: int, month: int) -> tuple[date, date]:
+    """Get the first day of a calendar month and the first day of the next month.
+
+    Filtering on a half-open date range instead of wrapping the column
+    in `year()`/`month()` lets the database use the date index.
+    """
+    start = __first_of_month(year, month)
+    if month == 12:
+        return start, __first_of_month(year + 1, 1)
+    return start, __first_of_month(year, month + 1)
+
+
+def year_range(year: int) -> tuple[date, date]:
+    """Get the first day of a year and the first day of the next year."""
+    return __first_of_month(year, 1), __first_of_month(year + 1, 1)
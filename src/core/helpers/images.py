@@ -0,0 +1,124 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TypedDict
+
+from flask import current_app
+from PIL import Image, ImageOps, features
+
+from src.configuration import get_config, get_secret
+
+
+__all__ = ["ImageInfo", "VariantInfo", "create_variants", "variant_names"]
+
+
+# Every image gets a full size variant and a thumbnail variant
+LABELS = ("full", "thumb")
+
+# The image formats every variant is created in, by their file extension
+FORMATS = {"avif": "AVIF", "webp": "WEBP"}
+
+
+class VariantInfo(TypedDict):
+    file: str
+    format: str
+    size: int
+
+
+class ImageInfo(TypedDict):
+    width: int
+    height: int
+    variants: dict[str, dict[str, VariantInfo]]
+
+
+def __formats() -> dict[str, str]:
+    """Get the variant formats this install of Pillow can actually create."""
+    return {ext: fmt for ext, fmt in FORMATS.items() if features.check(ext)}
+
+
+def _render(
+    images_dir: str, file: str, thumb_size: int, formats: dict[str, str]
+) -> ImageInfo | None:
+    """Create all variants of a media file.
+
+    This runs in a separate process, so it can't use the app.
+    If any variant can't be created, none of them are kept.
+    """
+    source = Path(images_dir) / file
+    written: list[Path] = []
+    try:
+        with Image.open(source) as img:
+            # Only use the first frame of a GIF, and respect the camera orientation
+            img.seek(0)
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            info = ImageInfo(width=img.width, height=img.height, variants={})
+
+            for label in LABELS:
+                variant = img.copy()
+                if label == "thumb":
+                    variant.thumbnail((thumb_size, thumb_size))
+                info["variants"][label] = {}
+                for ext, fmt in formats.items():
+                    variant_file = variant_names(file, label, ext)[0]
+                    variant_path = Path(images_dir) / variant_file
+                    written.append(variant_path)
+                    variant.save(variant_path, fmt)
+                    info["variants"][label][ext] = VariantInfo(
+                        file=variant_file,
+                        format=f"image/{ext}",
+                        size=variant_path.stat().st_size,
+                    )
+            return info
+
+    # This is not an image we know how to work with (such as a video),
+    # so don't leave behind any variants we managed to create
+    except (OSError, ValueError):
+        for variant_path in written:
+            variant_path.unlink(missing_ok=True)
+        return None
+
+
+def create_variants(files: list[str]) -> list[ImageInfo | None]:
+    """Create the variants of media files, all at the same time.
+
+    Resizing and encoding images is slow, CPU-bound work,
+    so it is done in a pool of separate processes.
+    """
+    if not files:
+        return []
+
+    # The pool is started from a job thread in an already threaded worker.
+    # Forking could copy a lock another thread is holding into the new
+    # process, so the processes are started from a clean server process instead
+    if (pool := current_app.extensions.get("image_pool")) is None:
+        pool = current_app.extensions.setdefault(
+            "image_pool",
+            ProcessPoolExecutor(
+                get_config("IMAGE_WORKERS"),
+                mp_context=multiprocessing.get_context("forkserver"),
+            ),
+        )
+
+    images_dir = get_secret("IMAGES_DIR")
+    thumb_size = get_config("IMAGE_THUMBNAIL_SIZE")
+    formats = __formats()
+    renders = [
+        pool.submit(_render, images_dir, file, thumb_size, formats) for file in files
+    ]
+    return [render.result() for render in renders]
+
+
+def variant_names(
+    file: str, label: str | None = None, ext: str | None = None
+) -> list[str]:
+    """Get the names of a media file's variants.
+
+    Variants are named after the original file's name, so a file's
+    variants can always be found without looking anything up.
+    """
+    labels = [label] if label else list(LABELS)
+    exts = [ext] if ext else list(FORMATS)
+    stem = Path(file).with_suffix("").as_posix()
+    return [f"{stem}.{label}.{ext}" for label in labels for ext in exts]
@@ -1,43 +1,237 @@
+import hashlib
+import os
 import secrets
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path, PurePath
-from typing import Literal
+from typing import Callable, NamedTuple, cast
 
 import httpx
+from flask import current_app
 
-from src.configuration import get_secret
+from src.configuration import get_config, get_secret
 
 __all__ = [
-    "delete",
+    "Download",
+    "adopt",
+    "content_name",
+    "discard",
     "download",
+    "download_all",
+    "exists",
     "is_valid_url",
-    "move",
-    "saved_name",
+    "relocate",
+    "remove",
+    "store",
+    "touch",
 ]
 
 
-def delete(prompt_id: int, media_id: int | None = None) -> Literal[True]:
-    """Delete media files associated with a Prompt.
+# Media is streamed to disk in pieces of this size
+CHUNK_SIZE = 64 * 1024
 
-    If a specific Media file ID is given, only that file will be deleted.
-    Otherwise, all files associated with the Prompt ID will be deleted.
+
+class Download(NamedTuple):
+    """A downloaded media file, waiting in the temporary directory.
+
+    If the media had not changed since it was last downloaded,
+    nothing is actually downloaded and `file` and `sha256` are empty.
+    """
+
+    url: str
+    file: str | None
+    sha256: str | None
+    etag: str | None
+
+
+def __hash_file(path: Path) -> str:
+    """Hash a file in pieces so large media isn't read in all at once."""
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def __shard(name: str) -> str:
+    """Spread stored files over nested directories by their leading characters.
+
+    This keeps any one directory from holding every single media file.
+    """
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+
+def adopt(legacy_file: str) -> tuple[str, str] | None:
+    """Move a legacy-named media file into the content-addressed store.
+
+    The legacy name is kept as a hard link to the stored file,
+    so links to the old name keep working without using any more space.
+    """
+    images_dir = Path(get_secret("IMAGES_DIR"))
+    legacy_path = images_dir / legacy_file
+    if not legacy_path.is_file():
+        return None
+
+    # If we already have the same file, the legacy copy becomes a link to it
+    digest = __hash_file(legacy_path)
+    stored_file = __shard(f"{digest}{legacy_path.suffix}")
+    stored_path = images_dir / stored_file
+    if not stored_path.exists():
+        stored_path.parent.mkdir(parents=True, exist_ok=True)
+        os.link(legacy_path, stored_path)
+    elif not legacy_path.samefile(stored_path):
+        temp_path = legacy_path.with_name(f"{legacy_file}.{secrets.token_hex(4)}")
+        os.link(stored_path, temp_path)
+        temp_path.replace(legacy_path)
+    return stored_file, digest
+
+
+def content_name(sha256: str, url: str) -> str:
+    """Generate the media's saved file path from its contents."""
+    return __shard(f"{sha256}{PurePath(original_name(url)).suffix}")
+
+
+class _Downloader:
+    """Download media files using a shared, pooled HTTP client.
+
+    Creating an HTTP client is expensive, and a separate client for each
+    file means a new connection for each file. Instead, one client and
+    a small thread pool are kept for the app and reused for every download.
     """
-    pattern = f"*-{prompt_id}-*" if media_id is None else f"{media_id}-{prompt_id}*"
-    all_media = Path(get_secret("IMAGES_DIR")).glob(pattern)
-    for f in all_media:
-        f.unlink()
-    return True
 
+    def __init__(self, max_bytes: int, timeout: float, workers: int) -> None:
+        # Downloads run outside of the app context, so hold onto the logger
+        self.logger = current_app.logger
+        self.max_bytes = max_bytes
+        self.client = httpx.Client(
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=workers),
+        )
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="media-download")
+
+    def fetch(self, url: str, dl_path: Path, etag: str | None) -> Download | None:
+        """Stream a file to disk, giving up if it is too large or unavailable.
+
+        The file is hashed as it comes in. If an ETag from an earlier
+        download is given, the file is only downloaded if it has changed.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            with self.client.stream("GET", url, headers=headers) as r:
+                # We already have this exact file
+                if r.status_code == httpx.codes.NOT_MODIFIED:
+                    return Download(url, None, None, etag)
+                r.raise_for_status()
+
+                # Don't even start a download we already know is too large.
+                # A size header that isn't a number tells us nothing at all
+                try:
+                    expected_size = int(r.headers.get("Content-Length", 0))
+                except ValueError:
+                    expected_size = 0
+                if expected_size > self.max_bytes:
+                    return None
+
+                # The size header can be missing or wrong,
+                # so keep checking the size as the file comes in
+                size = 0
+                sha256 = hashlib.sha256()
+                with dl_path.open("wb") as f:
+                    for chunk in r.iter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            break
+                        sha256.update(chunk)
+                        f.write(chunk)
+                    else:
+                        return Download(
+                            url, dl_path.name, sha256.hexdigest(), r.headers.get("ETag")
+                        )
+
+        except (httpx.HTTPError, OSError) as exc:
+            self.logger.warning(f"Unable to download media {url}: {exc}")
+
+        # The download failed, so don't leave a partial file behind
+        dl_path.unlink(missing_ok=True)
+        return None
+
+
+def __downloader() -> _Downloader:
+    if (downloader := current_app.extensions.get("media_downloader")) is None:
+        downloader = current_app.extensions.setdefault(
+            "media_downloader",
+            _Downloader(
+                get_config("MEDIA_MAX_BYTES"),
+                get_config("MEDIA_DOWNLOAD_TIMEOUT"),
+                get_config("MEDIA_DOWNLOAD_WORKERS"),
+            ),
+        )
+    return downloader
 
-def download(url: str) -> str:
-    """Download a Tweet's media."""
-    # Generate a random file name for the download
+
+def __temp_path(url: str) -> Path:
+    """Generate a random temporary file path for a download."""
     temp_f_name = f"{secrets.token_hex(12)}{PurePath(original_name(url)).suffix}"
+    return Path(get_secret("IMAGES_DIR_TEMP")).resolve() / temp_f_name
+
+
+def discard(*downloads: Download) -> None:
+    """Remove downloaded files still waiting in the temporary directory."""
+    temp_dir = Path(get_secret("IMAGES_DIR_TEMP"))
+    for download in downloads:
+        if download.file is not None:
+            (temp_dir / download.file).unlink(missing_ok=True)
+    return None
+
+
+def download(url: str, etag: str | None = None) -> Download | None:
+    """Download a Tweet's media to the temporary directory."""
+    return __downloader().fetch(url, __temp_path(url), etag)
+
+
+def download_all(
+    urls: list[str],
+    progress: Callable[[int, int], None] | None = None,
+    etags: list[str | None] | None = None,
+) -> list[Download] | None:
+    """Download multiple Tweet media at the same time.
 
-    # Download the media to a temp directory and provide the temp file name
-    r = httpx.get(url)
-    dl_path = Path(get_secret("IMAGES_DIR_TEMP")).resolve() / temp_f_name
-    dl_path.write_bytes(r.content)
-    return temp_f_name
+    Either every file is downloaded and all of the downloads are provided,
+    in order, or nothing is downloaded at all. If given, `progress` is told
+    the number of finished and failed downloads as each one completes.
+    """
+    downloader = __downloader()
+    etags = etags or [None] * len(urls)
+
+    # Everything that needs the app must be worked out before
+    # handing the downloads off to the thread pool
+    dl_paths = [__temp_path(url) for url in urls]
+    downloads = [
+        downloader.pool.submit(downloader.fetch, url, dl_path, etag)
+        for url, dl_path, etag in zip(urls, dl_paths, etags)
+    ]
+    finished = failed = 0
+    for download in as_completed(downloads):
+        if download.result() is None:
+            failed += 1
+        else:
+            finished += 1
+        if progress is not None:
+            progress(finished, failed)
+
+    results = [download.result() for download in downloads]
+    if all(result is not None for result in results):
+        return cast(list[Download], results)
+
+    # At least one download failed, so throw out the ones that didn't
+    for dl_path in dl_paths:
+        dl_path.unlink(missing_ok=True)
+    return None
+
+
+def exists(file: str) -> bool:
+    """Determine if a media file is stored."""
+    return (Path(get_secret("IMAGES_DIR")) / file).is_file()
 
 
 def is_valid_url(url: str) -> bool:
@@ -59,14 +253,6 @@ def is_valid_url(url: str) -> bool:
         return False
 
 
-def move(temp_file: str, final_file: str) -> bool:
-    """Move a media file from the temporary directory to final location."""
-    current_path = Path(get_secret("IMAGES_DIR_TEMP")) / temp_file
-    final_path = Path(get_secret("IMAGES_DIR")) / final_file
-    current_path.replace(final_path)
-    return final_path.is_file()
-
-
 def original_name(url: str) -> str:
     """Extract the media file name from its URL."""
     name = httpx.URL(url).path.split("/")[2]
@@ -78,10 +264,55 @@ def original_name(url: str) -> str:
     return name
 
 
-def saved_name(prompt_id: int, media_id: int, url: str) -> str:
-    """Generate the media's saved file name."""
-    return "{media_id}-{id}-{original}".format(
-        media_id=media_id,
-        id=prompt_id,
-        original=original_name(url),
-    )
+def relocate(file: str) -> str | None:
+    """Move a stored media file from the top of the media directory to its shard."""
+    images_dir = Path(get_secret("IMAGES_DIR"))
+    sharded_file = __shard(file)
+    sharded_path = images_dir / sharded_file
+    if not sharded_path.exists():
+        if not (images_dir / file).is_file():
+            return None
+        sharded_path.parent.mkdir(parents=True, exist_ok=True)
+        (images_dir / file).replace(sharded_path)
+
+    # The same file was already moved for another Prompt Media
+    else:
+        (images_dir / file).unlink(missing_ok=True)
+    return sharded_file
+
+
+def remove(*files: str) -> None:
+    """Remove media files (or legacy links to them) that are no longer used."""
+    images_dir = Path(get_secret("IMAGES_DIR"))
+    for file in files:
+        (images_dir / file).unlink(missing_ok=True)
+    return None
+
+
+def store(download: Download) -> str:
+    """Move a downloaded media file into the content-addressed store.
+
+    Files are named after their contents, so if we already
+    have the exact same file, the new copy is simply thrown away.
+    """
+    temp_path = Path(get_secret("IMAGES_DIR_TEMP")) / cast(str, download.file)
+    final_file = content_name(cast(str, download.sha256), download.url)
+    try:
+        touch(final_file)
+    except FileNotFoundError:
+        final_path = Path(get_secret("IMAGES_DIR")) / final_file
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.replace(final_path)
+    else:
+        temp_path.unlink()
+    return final_file
+
+
+def touch(file: str) -> None:
+    """Mark a stored media file as just used.
+
+    The media garbage collection leaves recently changed files alone,
+    so a file being reused can't be removed before its new use is recorded.
+    """
+    os.utime(Path(get_secret("IMAGES_DIR")) / file)
+    return None
@@ -0,0 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Lock, Timer
+from typing import Callable, Protocol
+
+from flask import Flask, current_app
+
+import src.core.database.v2 as db
+from src.configuration import get_config
+from src.core.database.models import Job
+
+
+__all__ = ["handler", "init_app", "queue", "run"]
+
+
+class Progress(Protocol):
+    def __call__(self, completed: int, failed: int = 0) -> None:
+        """Record how many of the job's items have been completed and have failed."""
+
+
+# A job handler is given the job and a way to report its progress,
+# and provides an optional result on success or False on failure
+JobHandler = Callable[[Job, Progress], str | bool | None]
+
+# All of the available job handlers, keyed by the job kind
+HANDLERS: dict[str, JobHandler] = {}
+
+# Only one thread should ever start the worker pool
+START_LOCK = Lock()
+
+
+def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register a function to run all jobs of the given kind."""
+
+    def decorator(func: JobHandler) -> JobHandler:
+        HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def __pool() -> ThreadPoolExecutor:
+    """Get the background job worker pool, starting it on first use."""
+    with START_LOCK:
+        if (pool := current_app.extensions.get("jobs")) is None:
+            pool = current_app.extensions["jobs"] = ThreadPoolExecutor(
+                get_config("JOB_WORKERS"), thread_name_prefix="jobs"
+            )
+    return pool
+
+
+def __submit(job_id: int) -> None:
+    # Jobs run outside of the current request, so give them their own app context
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    def in_app_context() -> None:
+        with app.app_context():
+            run(job_id)
+
+    __pool().submit(in_app_context)
+    return None
+
+
+def __resume() -> None:
+    """Pick up any jobs left behind by a previous or crashed worker."""
+    stale_after = timedelta(seconds=get_config("JOB_STALE_AFTER"))
+    for job_id in db.jobs.pending(stale_after):
+        __submit(job_id)
+    return None
+
+
+def __collect_garbage(app: Flask, interval: int) -> None:
+    """Queue the media garbage collection if it's due, and check again later."""
+    with app.app_context():
+        try:
+            last = db.jobs.latest("media_garbage")
+            if last is None or (
+                last.status not in ("queued", "running")
+                and last.date_added < datetime.now() - timedelta(seconds=interval)
+            ):
+                queue("media_garbage", {})
+        except Exception as exc:
+            app.logger.exception(exc)
+
+    timer = Timer(interval, __collect_garbage, (app, interval))
+    timer.daemon = True
+    timer.start()
+    return None
+
+
+def __start() -> None:
+    """Pick up the leftover jobs once the app has started serving requests."""
+    with START_LOCK:
+        if current_app.extensions.get("jobs_resumed"):
+            return None
+        current_app.extensions["jobs_resumed"] = True
+
+    # Finding the leftover jobs needs the database,
+    # so don't hold up the request to do it
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    def resume() -> None:
+        with app.app_context():
+            try:
+                __resume()
+            except Exception as exc:
+                app.logger.exception(exc)
+
+    __pool().submit(resume)
+
+    # Nothing else ever removes the media files that are no longer used
+    if interval := get_config("MEDIA_GC_INTERVAL"):
+        __pool().submit(__collect_garbage, app, interval)
+    return None
+
+
+def init_app(app: Flask) -> None:
+    """Run background jobs in the app.
+
+    The worker pool is only started when a job is queued or the app
+    serves its first request, and only the latter picks up any leftover
+    jobs and schedules the media garbage collection. Creating the app for
+    a CLI command or script runs no jobs at all.
+    """
+    app.before_request(__start)
+    return None
+
+
+def queue(kind: str, payload: dict, *, total: int = 0) -> Job:
+    """Record a new job and run it in the background."""
+    job = db.jobs.create(kind, payload, total=total)
+    __submit(job._id)
+    return job
+
+
+def run(job_id: int) -> None:
+    """Run a queued job, recording the outcome."""
+    # Another worker got to the job first
+    if (job := db.jobs.claim(job_id)) is None:
+        return None
+
+    try:
+        result = HANDLERS[job.kind](
+            job, lambda done, failed=0: db.jobs.progress(job_id, done, failed)
+        )
+    # Jobs run outside of any request, so there's no request to log with the error
+    except Exception as exc:
+        current_app.logger.exception(exc)
+        db.jobs.fail(job_id, str(exc) or type(exc).__name__)
+        return None
+
+    if result is False:
+        db.jobs.fail(job_id, f"Unable to complete {job.kind} job {job_id}.")
+    else:
+        db.jobs.finish(job_id, result if isinstance(result, str) else None)
+    return None
+
+
+@handler("archive")
+def _create_archive(job: Job, report: Progress) -> str | bool:
+    """Generate a new Prompt archive."""
+    return db.archive.create(progress=report) or False
+
+
+@handler("media")
+def _create_media(job: Job, report: Progress) -> bool:
+    """Download and record the media for a Prompt."""
+    prompt_id = job.payload["prompt_id"]
+    if not db.prompts.create_media(prompt_id, job.payload["items"], progress=report):
+        return False
+
+    # The image variants are made separately so the media is available right away
+    queue("media_variants", {"prompt_id": prompt_id})
+    return True
+
+
+@handler("media_variants")
+def _create_variants(job: Job, report: Progress) -> bool:
+    """Create the image variants for a Prompt's media."""
+    return db.prompts.create_variants(job.payload["prompt_id"])
+
+
+@handler("media_garbage")
+def _collect_media_garbage(job: Job, report: Progress) -> str:
+    """Remove the media files that no Prompt Media uses anymore."""
+    stats = db.orphans.collect(action="remove")
+    return f"Removed {stats.removed} of {stats.scanned} media files."
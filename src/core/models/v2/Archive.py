@@ -1,8 +1,21 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 
 
-__all__ = ["File"]
+__all__ = ["Export", "File", "FileName"]
+
+
+class Export(Schema):
+    format = fields.String(
+        load_default="csv", validate=validate.OneOf(["csv", "jsonl", "parquet"])
+    )
 
 
 class File(Schema):
     file_name = fields.String(dump_only=True)
+    size = fields.Integer(dump_only=True)
+    sha256 = fields.String(dump_only=True)
+    date_generated = fields.DateTime("iso", dump_only=True)
+
+
+class FileName(Schema):
+    file_name = fields.String(required=True)
@@ -22,9 +22,19 @@ class ByYearMonth(ByYear):
 
 
 class GetMonths(Schema):
+    class _MonthTotal(Schema):
+        month = fields.Integer(strict=True)
+        total = fields.Integer(strict=True)
+
     year = fields.Integer(required=True, load_only=True)
     months = fields.List(fields.Integer(strict=True), dump_only=True)
+    totals = fields.List(fields.Nested(_MonthTotal), dump_only=True)
 
 
 class GetYears(Schema):
+    class _YearTotal(Schema):
+        year = fields.Integer(strict=True)
+        total = fields.Integer(strict=True)
+
     years = fields.List(fields.Integer(strict=True))
+    totals = fields.List(fields.Nested(_YearTotal))
@@ -1,11 +1,13 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 
 
 __all__ = ["All", "Address"]
 
 
 class Address(Schema):
-    address = fields.List(fields.Email(), required=True)
+    address = fields.List(
+        fields.Email(validate=validate.Length(max=150)), required=True
+    )
 
 
 class All(Schema):
@@ -0,0 +1,23 @@
+from marshmallow import Schema, fields
+
+
+__all__ = ["Job", "JobId"]
+
+
+class Job(Schema):
+    """A background job and its progress."""
+
+    _id = fields.Integer(strict=True, dump_only=True)
+    kind = fields.String(dump_only=True)
+    status = fields.String(dump_only=True)
+    progress = fields.Integer(dump_only=True)
+    failed = fields.Integer(dump_only=True)
+    total = fields.Integer(dump_only=True)
+    result = fields.String(dump_only=True, allow_none=True)
+    error = fields.String(dump_only=True, allow_none=True)
+    date_added = fields.DateTime("iso", dump_only=True)
+    date_updated = fields.DateTime("iso", dump_only=True)
+
+
+class JobId(Schema):
+    job_id = fields.Integer(strict=True, required=True)
@@ -13,15 +13,32 @@ __all__ = [
     "PromptDate",
     "PromptId",
     "PromptUpdate",
+    "Variant",
 ]
 
 
+class Variant(Schema):
+    file = fields.String(dump_only=True)
+    format = fields.String(dump_only=True)
+    size = fields.Integer(dump_only=True)
+
+
 class Media(Schema):
     _id = fields.Integer(strict=True, dump_only=True)
     alt_text = fields.String(required=True, allow_none=True)
     file = fields.String(required=True, allow_none=True, dump_only=True)
     url = fields.Url(required=True, load_only=True)
 
+    # Image variants, by size ("full", "thumb") then format ("avif", "webp")
+    width = fields.Integer(allow_none=True, dump_only=True)
+    height = fields.Integer(allow_none=True, dump_only=True)
+    variants = fields.Dict(
+        keys=fields.String(),
+        values=fields.Dict(keys=fields.String(), values=fields.Nested(Variant)),
+        allow_none=True,
+        dump_only=True,
+    )
+
 
 class MediaId(Schema):
     media_id = fields.Integer(strict=True, required=True)
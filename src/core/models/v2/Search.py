@@ -1,7 +1,7 @@
 from marshmallow import Schema, fields, validate
 
 
-__all__ = ["Results", "Query"]
+__all__ = ["Page", "Results", "Query"]
 
 
 class Results(Schema):
@@ -13,6 +13,12 @@ class Results(Schema):
     query = fields.String()
     prompts = fields.List(fields.Nested(_prompt))
     total = fields.Integer(strict=True)
+    next = fields.String(allow_none=True)
+
+
+class Page(Schema):
+    limit = fields.Integer(load_default=None, validate=validate.Range(min=1, max=500))
+    after = fields.String(load_default=None)
 
 
 class Query(Schema):
@@ -0,0 +1,114 @@
+import math
+from hashlib import blake2b
+from typing import Callable, NoReturn, Protocol, TypeVar
+
+from flask import Response, current_app, g, request
+from flask_smorest import abort
+
+from src.configuration import get_config
+from src.core.auth_helpers import is_valid_key
+from src.core.rate_limit import memory, shared
+from src.core.rate_limit.buckets import Budget, Decision
+
+
+__all__ = [
+    "Budget",
+    "Decision",
+    "RateLimitBackend",
+    "backend",
+    "budget",
+    "check",
+    "headers",
+]
+
+
+T = TypeVar("T")
+
+
+class RateLimitBackend(Protocol):
+    def take(self, key: str, budget: Budget) -> Decision:
+        """Take a token from a bucket, starting with a full bucket if needed."""
+
+
+# All of the available bucket stores, selectable by the `RATE_LIMIT_BACKEND` config
+BACKENDS: dict[str, type[RateLimitBackend]] = {
+    "memory": memory.MemoryBuckets,
+    "shared": shared.SharedBuckets,
+}
+
+
+def backend() -> RateLimitBackend | None:
+    """Get the configured rate limit backend for this app."""
+    # No backend turns off rate limiting entirely
+    if not (name := get_config("RATE_LIMIT_BACKEND")):
+        return None
+    if (buckets := current_app.extensions.get("rate_limit")) is None:
+        buckets = current_app.extensions.setdefault("rate_limit", BACKENDS[name]())
+    return buckets
+
+
+def budget(name: str) -> Callable[[T], T]:
+    """Give a view, or a single method of one, its own rate limit budget.
+
+    This is meant for expensive endpoints, so heavy use of them
+    doesn't use up the budget for everything else, and vice versa.
+    """
+
+    def decorator(view: T) -> T:
+        setattr(view, "rate_limit_budget", name)
+        return view
+
+    return decorator
+
+
+def __budget_name() -> str:
+    """Get the name of the budget the current request is made from."""
+    view = current_app.view_functions.get(request.endpoint)
+    view_class = getattr(view, "view_class", view)
+    method = getattr(view_class, request.method.lower(), None)
+    for target in (method, view_class):
+        if (name := getattr(target, "rate_limit_budget", None)) is not None:
+            return name
+    return "default"
+
+
+def __identity() -> str:
+    """Identify who is making the current request."""
+    # Requests made with a real API key are limited by the key, everything
+    # else by where the request came from. A made up key is never trusted,
+    # or every new one would come with a brand new budget
+    auth = request.authorization
+    if auth is not None and auth.type == "bearer" and auth.token:
+        if is_valid_key(auth.token):
+            token = auth.token.encode()
+            return f"key:{blake2b(token, digest_size=16).hexdigest()}"
+    return f"ip:{request.remote_addr}"
+
+
+def check() -> None | NoReturn:
+    """Take a token for the current request, turning it away if there are none."""
+    if (buckets := backend()) is None:
+        return None
+
+    name = __budget_name()
+    limits = Budget(**get_config("RATE_LIMITS")[name])
+    decision = buckets.take(f"{name}:{__identity()}", limits)
+    g.rate_limit = (limits, decision)
+    if not decision.allowed:
+        abort(429, message="Too many requests. Please slow down.")
+    return None
+
+
+def headers(response: Response) -> Response:
+    """Let the client know how much of their budget is left."""
+    if (rate_limit := g.pop("rate_limit", None)) is None:
+        return response
+
+    limits, decision = rate_limit
+    response.headers["RateLimit-Limit"] = str(limits.limit)
+    response.headers["RateLimit-Remaining"] = str(decision.remaining)
+    response.headers["RateLimit-Reset"] = str(math.ceil(decision.reset))
+    response.headers["RateLimit-Policy"] = f"{limits.limit};w={int(limits.window)}"
+    if not decision.allowed:
+        response.headers["Retry-After"] = str(math.ceil(decision.retry_after))
+    return response
@@ -0,0 +1,44 @@
+from typing import NamedTuple
+
+
+__all__ = ["Budget", "Decision", "take"]
+
+
+class Budget(NamedTuple):
+    """How many requests can be made, and how quickly they are allowed again.
+
+    A full bucket allows `limit` requests all at once, and an empty
+    bucket fills back up at an even pace over `window` seconds.
+    """
+
+    limit: int
+    window: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    reset: float
+    retry_after: float
+
+
+def take(
+    tokens: float, updated: float, budget: Budget, now: float
+) -> tuple[float, Decision]:
+    """Refill a bucket for the time that has passed, then take a token from it.
+
+    The bucket's new number of tokens is provided along with the decision.
+    """
+    tokens = min(budget.limit, tokens + (now - updated) * budget.rate)
+    if allowed := tokens >= 1:
+        tokens -= 1
+    return tokens, Decision(
+        allowed,
+        int(tokens),
+        (budget.limit - tokens) / budget.rate,
+        0 if allowed else (1 - tokens) / budget.rate,
+    )
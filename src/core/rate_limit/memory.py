@@ -0,0 +1,26 @@
+import time
+from threading import Lock
+
+from src.core.rate_limit.buckets import Budget, Decision, take
+
+
+__all__ = ["MemoryBuckets"]
+
+
+class MemoryBuckets:
+    """Token buckets kept in the memory of this worker.
+
+    Every worker has its own buckets, so this is only meant for testing.
+    """
+
+    def __init__(self) -> None:
+        self.__buckets: dict[str, tuple[float, float]] = {}
+        self.__lock = Lock()
+
+    def take(self, key: str, budget: Budget) -> Decision:
+        now = time.time()
+        with self.__lock:
+            tokens, updated = self.__buckets.get(key, (budget.limit, now))
+            tokens, decision = take(tokens, updated, budget, now)
+            self.__buckets[key] = (tokens, now)
+        return decision
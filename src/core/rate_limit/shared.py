@@ -0,0 +1,70 @@
+import sqlite3
+import time
+from itertools import count
+from threading import local
+
+from src.configuration import get_config
+from src.core.rate_limit.buckets import Budget, Decision, take
+
+
+__all__ = ["SharedBuckets"]
+
+
+# Buckets that have filled back up are the same as no bucket at all,
+# so every so many requests they are cleaned out
+PRUNE_EVERY = 1000
+
+
+class SharedBuckets:
+    """Token buckets shared by every worker, kept in a SQLite database.
+
+    The database lives in shared memory by default, so using it is about
+    as quick as using our own memory, and SQLite's locking means two
+    workers can never both take the last token from a bucket.
+    """
+
+    def __init__(self) -> None:
+        self.__path = get_config("RATE_LIMIT_FILE")
+        self.__local = local()
+        self.__takes = count(1)
+        self.__connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, full_at REAL)"
+        )
+
+    def __connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared between threads
+        if (conn := getattr(self.__local, "conn", None)) is None:
+            conn = sqlite3.connect(self.__path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self.__local.conn = conn
+        return conn
+
+    def take(self, key: str, budget: Budget) -> Decision:
+        now = time.time()
+        conn = self.__connection()
+
+        # Lock the database right away so no one else changes the bucket
+        # between us reading it and writing it back
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row is not None else (budget.limit, now)
+            tokens, decision = take(tokens, updated, budget, now)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated, full_at) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, now + decision.reset),
+            )
+            if next(self.__takes) % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return decision
@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from datetime import date, datetime, time
+from hashlib import blake2b
+from threading import Lock
+from typing import NamedTuple, TypeVar
+
+from flask import Response, current_app, g, request
+
+from src.configuration import get_config
+from src.core.database import generation
+
+
+__all__ = ["clear", "exempt", "lookup", "store"]
+
+
+T = TypeVar("T")
+
+
+class _CacheKey(NamedTuple):
+    path: str
+    query: tuple[tuple[str, str], ...]
+    generation: int
+    day: date
+
+
+class _CachedResponse(NamedTuple):
+    body: bytes
+    status: int
+    headers: list[tuple[str, str]]
+
+
+class _ResponseCache:
+    """A size-bound, least recently used cache of rendered responses."""
+
+    def __init__(self, max_size: int) -> None:
+        self.__max_size = max_size
+        self.__entries: OrderedDict[_CacheKey, _CachedResponse] = OrderedDict()
+        self.__lock = Lock()
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def get(self, key: _CacheKey) -> _CachedResponse | None:
+        with self.__lock:
+            if (entry := self.__entries.get(key)) is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    def put(self, key: _CacheKey, entry: _CachedResponse) -> None:
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_size:
+                self.__entries.popitem(last=False)
+
+
+def __cache() -> _ResponseCache | None:
+    # A cache size of zero turns off response caching entirely
+    if not (max_size := get_config("RESPONSE_CACHE_SIZE")):
+        return None
+    if (cache := current_app.extensions.get("response_cache")) is None:
+        cache = current_app.extensions.setdefault(
+            "response_cache", _ResponseCache(max_size)
+        )
+    return cache
+
+
+def __current_key() -> _CacheKey:
+    # The key includes the data generation, so a write anywhere makes
+    # every older entry unreachable, and today's date, so tomorrow's
+    # Prompt is shown as soon as it is released at midnight
+    return _CacheKey(
+        request.path,
+        tuple(sorted(request.args.items(multi=True))),
+        generation.current(),
+        date.today(),
+    )
+
+
+def __etag(key: _CacheKey) -> str:
+    """Build a strong ETag for the response identified by the key.
+
+    A response is fully determined by its key, so the key itself
+    is a perfectly good validator without hashing the body.
+    """
+    return blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+def __last_modified(key: _CacheKey) -> datetime:
+    """Get the time the response identified by the key last changed."""
+    # Responses also change at midnight, when a new Prompt is released
+    midnight = datetime.combine(key.day, time()).astimezone()
+    return max(generation.last_modified(), midnight).replace(microsecond=0)
+
+
+def __not_modified(key: _CacheKey) -> bool:
+    """Determine if the client already has the current response."""
+    # Per RFC 9110, If-Modified-Since is ignored when If-None-Match is sent
+    if request.if_none_match:
+        return request.if_none_match.contains(__etag(key))
+    if request.if_modified_since is not None:
+        return request.if_modified_since >= __last_modified(key)
+    return False
+
+
+def __is_cacheable() -> bool:
+    """Determine if the current request can be answered from the cache."""
+    # Only anonymous reads are cached. Anything sent with an API key
+    # may behave differently depending on the key's permissions
+    if request.method not in ("GET", "HEAD") or request.authorization is not None:
+        return False
+
+    # Some views answer conditional requests themselves
+    view = current_app.view_functions.get(request.endpoint)
+    return not getattr(
+        getattr(view, "view_class", view), "response_cache_exempt", False
+    )
+
+
+def exempt(view: T) -> T:
+    """Keep the responses of a view out of the response cache entirely.
+
+    This is meant for views that handle conditional requests themselves,
+    such as file downloads with their own ETags.
+    """
+    setattr(view, "response_cache_exempt", True)
+    return view
+
+
+@generation.on_change
+def clear() -> None:
+    """Throw out all cached responses."""
+    if (cache := current_app.extensions.get("response_cache")) is not None:
+        cache.clear()
+    return None
+
+
+def lookup() -> Response | None:
+    """Answer the current request without running the view, if at all possible.
+
+    A client that already has the current response is told so
+    before anything is queried or serialized. Otherwise,
+    a cached copy of the response is used if we have one.
+    """
+    if not __is_cacheable():
+        return None
+
+    key = g.response_cache_key = __current_key()
+    if __not_modified(key):
+        return current_app.response_class(status=304)
+    if (cache := __cache()) is not None and (entry := cache.get(key)) is not None:
+        return current_app.response_class(entry.body, entry.status, entry.headers)
+    return None
+
+
+def store(response: Response) -> Response:
+    """Save a freshly rendered response for the next identical request."""
+    key = g.pop("response_cache_key", None)
+    if key is None or response.status_code not in (200, 304):
+        return response
+
+    # Let the client make a conditional request next time
+    response.set_etag(__etag(key))
+    response.last_modified = __last_modified(key)
+
+    # Only save freshly rendered responses. Streamed files
+    # are left alone as they are not held in memory
+    if (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and (cache := __cache()) is not None
+        and cache.get(key) is None
+    ):
+        cache.put(
+            key,
+            _CachedResponse(
+                response.get_data(),
+                response.status_code,
+                list(response.headers.items()),
+            ),
+        )
+    return response
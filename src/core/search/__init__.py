@@ -0,0 +1,66 @@
+from typing import Protocol
+
+from flask import current_app
+
+from src.configuration import get_config
+from src.core.database import generation
+from src.core.search import fulltext, memory
+from src.core.search.results import Cursor, SearchHit, SearchResults
+
+
+__all__ = [
+    "Cursor",
+    "SearchBackend",
+    "SearchHit",
+    "SearchResults",
+    "backend",
+    "invalidate",
+    "search",
+]
+
+
+class SearchBackend(Protocol):
+    def invalidate(self) -> None:
+        """Drop any state built from the recorded Prompts."""
+
+    def search(
+        self, query: str, *, limit: int | None, after: Cursor | None = None
+    ) -> SearchResults:
+        """Search the Prompt words and content, ranked by relevance.
+
+        Without a `limit`, every match is provided.
+        """
+
+
+# All of the available search engines, selectable by the `SEARCH_BACKEND` config
+BACKENDS: dict[str, type[SearchBackend]] = {
+    "fulltext": fulltext.FullTextSearch,
+    "memory": memory.InvertedIndexSearch,
+}
+
+
+def backend() -> SearchBackend:
+    """Get the configured search backend for this app.
+
+    A backend is only created once per app, letting it keep
+    any state it needs (such as an index) between requests.
+    """
+    if (engine := current_app.extensions.get("search")) is None:
+        engine = BACKENDS[get_config("SEARCH_BACKEND")]()
+        current_app.extensions["search"] = engine
+    return engine
+
+
+@generation.on_change
+def invalidate() -> None:
+    """Let the search backend know the recorded Prompts have changed."""
+    if (engine := current_app.extensions.get("search")) is not None:
+        engine.invalidate()
+    return None
+
+
+def search(
+    query: str, *, limit: int | None, after: Cursor | None = None
+) -> SearchResults:
+    """Search through the Prompts with an arbitrary query."""
+    return backend().search(query, limit=limit, after=after)
@@ -0,0 +1,89 @@
+import re
+from datetime import date
+
+from sqlalchemy import and_, case, or_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.sql import func
+
+from src.core.database.models import Host, Prompt, db
+from src.core.search.results import Cursor, SearchHit, SearchResults, paginate
+
+
+__all__ = ["FullTextSearch"]
+
+
+# InnoDB does not index words shorter than this by default
+MIN_TOKEN_SIZE = 3
+
+# Characters that have a special meaning in a boolean mode full-text search
+BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+
+class FullTextSearch:
+    """Search the Prompts using a MySQL FULLTEXT index on the word and content."""
+
+    def invalidate(self) -> None:
+        """The database index is always up to date, there's nothing to do."""
+
+    def search(
+        self, query: str, *, limit: int | None, after: Cursor | None = None
+    ) -> SearchResults:
+        # Require every word in the query to be present, allowing each word
+        # to be the start of a longer word (so "star" finds "starlight")
+        terms = BOOLEAN_OPERATORS.sub(" ", query).split()
+        indexed = [term for term in terms if len(term) >= MIN_TOKEN_SIZE]
+        filters = [Prompt.date <= date.today()]
+
+        # An exact match on the Prompt word should always rank first
+        exact_word = case((Prompt.word == query, 10), else_=0)
+        score = exact_word
+
+        # Short words are not in the full-text index at all, so we can only
+        # fall back to matching the start of the Prompt word for those terms
+        filters.extend(
+            Prompt.word.startswith(term, autoescape=True)
+            for term in terms
+            if len(term) < MIN_TOKEN_SIZE
+        )
+        if not terms:
+            filters.append(Prompt.word.startswith(query, autoescape=True))
+        if indexed:
+            against = " ".join(f"+{term}*" for term in indexed)
+            relevance = match(Prompt.word, Prompt.content, against=against)
+            relevance = relevance.in_boolean_mode()
+            score = relevance + exact_word
+            filters.append(relevance)
+        score = func.round(score, 6)
+
+        total = db.session.execute(
+            db.select(func.count(Prompt._id)).filter(*filters)
+        ).scalar_one()
+
+        # Pick up where the last page left off
+        if after is not None:
+            filters.append(
+                or_(
+                    score < after.score,
+                    and_(score == after.score, Prompt._id > after.id),
+                )
+            )
+
+        qs = (
+            db.select(
+                Prompt._id,
+                Prompt.date,
+                Prompt.word,
+                Host.handle,
+                score.label("score"),
+            )
+            .join(Host)
+            .filter(*filters)
+            .order_by(score.desc(), Prompt._id)
+        )
+        if limit is not None:
+            qs = qs.limit(limit + 1)
+        hits = [
+            SearchHit(row._id, row.date, row.word, row.handle, float(row.score))
+            for row in db.session.execute(qs).all()
+        ]
+        return paginate(hits, total, limit)
@@ -0,0 +1,134 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date
+from threading import Lock
+from typing import Iterable
+
+from src.core.database.models import Host, Prompt, db
+from src.core.search.results import Cursor, SearchHit, SearchResults, paginate
+
+
+__all__ = ["InvertedIndex", "InvertedIndexSearch", "tokenize"]
+
+
+# How much more a term found in the Prompt word counts over one in the content
+WORD_WEIGHT = 3
+
+# An exact match on the Prompt word should always rank first
+EXACT_WORD_BONUS = 10
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase searchable terms."""
+    return TOKEN.findall(text.casefold())
+
+
+@dataclass(frozen=True)
+class _Document:
+    id: int
+    date: date
+    word: str
+    handle: str
+
+
+class InvertedIndex:
+    """An in-process inverted index of the Prompt words and content.
+
+    Terms are kept in a sorted array, meaning every term starting
+    with a query term can be found with a binary search.
+    """
+
+    def __init__(self, documents: Iterable[tuple[int, date, str, str, str]]) -> None:
+        postings: defaultdict[str, Counter[int]] = defaultdict(Counter)
+        self.documents: dict[int, _Document] = {}
+        for id, prompt_date, word, content, handle in documents:
+            self.documents[id] = _Document(id, prompt_date, word, handle)
+            for term in tokenize(word):
+                postings[term][id] += WORD_WEIGHT
+            for term in tokenize(content):
+                postings[term][id] += 1
+
+        self.terms = sorted(postings)
+        self.postings = [postings[term] for term in self.terms]
+
+    def __matching(self, prefix: str) -> Counter[int]:
+        """Score every document with a term starting with the prefix."""
+        scores: Counter[int] = Counter()
+        start = bisect_left(self.terms, prefix)
+        for term, posting in zip(self.terms[start:], self.postings[start:]):
+            if not term.startswith(prefix):
+                break
+            scores.update(posting)
+        return scores
+
+    def search(
+        self, query: str, *, limit: int | None, after: Cursor | None = None
+    ) -> SearchResults:
+        if not (terms := tokenize(query)):
+            return SearchResults([], 0)
+
+        # Every term in the query needs to be present in a Prompt for it to match
+        scores = self.__matching(terms[0])
+        for term in terms[1:]:
+            matches = self.__matching(term)
+            scores = Counter({
+                id: score + matches[id] for id, score in scores.items() if id in matches
+            })
+
+        # Don't expose tomorrow's (or next week's) Prompt
+        today = date.today()
+        hits = []
+        for id, score in scores.items():
+            doc = self.documents[id]
+            if doc.date > today:
+                continue
+            if doc.word.casefold() == query.casefold():
+                score += EXACT_WORD_BONUS
+            hits.append(SearchHit(id, doc.date, doc.word, doc.handle, float(score)))
+
+        # Order the results by relevance and pick up where the last page left off
+        hits.sort(key=lambda hit: (-hit.score, hit.id))
+        total = len(hits)
+        if after is not None:
+            hits = [
+                hit for hit in hits if (-hit.score, hit.id) > (-after.score, after.id)
+            ]
+        if limit is not None:
+            hits = hits[: limit + 1]
+        return paginate(hits, total, limit)
+
+
+class InvertedIndexSearch:
+    """Search the Prompts using an in-process inverted index.
+
+    The index is built from the database on the first search and is kept
+    until the recorded Prompts change. This works with any database,
+    making it suitable for SQLite and testing.
+    """
+
+    def __init__(self) -> None:
+        self.__index: InvertedIndex | None = None
+        self.__lock = Lock()
+
+    def __build(self) -> InvertedIndex:
+        qs = db.select(
+            Prompt._id, Prompt.date, Prompt.word, Prompt.content, Host.handle
+        ).join(Host)
+        return InvertedIndex(db.session.execute(qs).all())
+
+    def invalidate(self) -> None:
+        self.__index = None
+
+    def search(
+        self, query: str, *, limit: int | None, after: Cursor | None = None
+    ) -> SearchResults:
+        # Only build the index once, even if multiple searches come in at once
+        if (index := self.__index) is None:
+            with self.__lock:
+                if (index := self.__index) is None:
+                    index = self.__index = self.__build()
+        return index.search(query, limit=limit, after=after)
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import NamedTuple
+
+
+__all__ = ["Cursor", "SearchHit", "SearchResults", "paginate"]
+
+
+class Cursor(NamedTuple):
+    """The position of the last result on a page of search results.
+
+    Because results are ordered by descending score then ascending ID,
+    the next page is everything that sorts after this position.
+    """
+
+    score: float
+    id: int
+
+    def __str__(self) -> str:
+        return f"{self.score!r}_{self.id}"
+
+    @classmethod
+    def from_str(cls, value: str) -> "Cursor":
+        """Parse a cursor previously given out with a page of results."""
+        score, _, id = value.partition("_")
+        return cls(float(score), int(id))
+
+
+class SearchHit(NamedTuple):
+    id: int
+    date: date
+    word: str
+    handle: str
+    score: float
+
+
+@dataclass
+class SearchResults:
+    prompts: list[SearchHit]
+    total: int
+    next: Cursor | None = None
+
+
+def paginate(hits: list[SearchHit], total: int, limit: int | None) -> SearchResults:
+    """Create a page of results from up to `limit + 1` ranked search hits.
+
+    Backends fetch a single extra hit so we can tell if there is another page
+    without having to count the results that come after this page. Without
+    a `limit`, every hit is on the one and only page.
+    """
+    if limit is None or len(hits) <= limit:
+        return SearchResults(hits, total)
+    last = hits[limit - 1]
+    return SearchResults(hits[:limit], total, Cursor(last.score, last.id))
@@ -3,7 +3,7 @@ from typing import Callable
 
 from flask_smorest import Blueprint as APIBlueprint
 
-from src.core import auth_helpers
+from src.core import auth_helpers, rate_limit, response_cache
 
 
 def _api_factory(
@@ -32,6 +32,11 @@ def _api_factory(
         description=description,
     )
 
+    # Throttle requests before doing anything else with them. Limits are
+    # added to responses after they are cached, so they aren't cached too
+    blueprint.before_request(rate_limit.check)
+    blueprint.after_request(rate_limit.headers)
+
     # Protect the endpoint with an authorization routine if one was given
     if auth_function is not None:
         blueprint.before_request(auth_function)
@@ -45,6 +50,10 @@ def _api_factory(
             "with the appropriate permissions."
         )
 
+        # Public responses only change when the data does, so cache them
+        blueprint.before_request(response_cache.lookup)
+        blueprint.after_request(response_cache.store)
+
     return blueprint
 
 
@@ -1,8 +1,8 @@
 from os import getenv
 
+import httpx
 from flask.views import MethodView
 from flask_smorest import abort
-from requests import codes
 
 from src.configuration import get_config
 from src.core.database.v2 import emails as db
@@ -46,29 +46,33 @@ class Email(MethodView):
         if not get_config("ENABLE_EMAIL_SENDING"):
             return None
 
+        # The same address could be given more than once, even in different cases
+        addresses = list({addr.casefold(): addr for addr in kwargs["address"]}.values())
+
         # Because the MG address validation endpoint costs money with each hit,
         # block it off unless we are running in production
         if getenv("FLASK_ENV") == "production":
-            for addr in kwargs["address"]:
-                if not mailgun.verify(addr):
-                    abort(500, message="Unable to validate provided email address.")
+            try:
+                undeliverable = mailgun.verify_all(addresses)
+            except httpx.HTTPError:
+                undeliverable = addresses
+            if undeliverable:
+                abort(500, message="Unable to validate provided email address.")
 
-        # Attempt to add the address to the database first
-        for addr in kwargs["address"]:
-            if not db.create(addr):
-                abort(
-                    500,
-                    message="Unable to add provided email address to mailing list.",
-                )
+        # Attempt to add the addresses to the database first, all at once
+        if (added := db.create_many(addresses)) is None:
+            abort(500, message="Unable to add provided email address to mailing list.")
 
-        # Next, attempt to add the address to the Mailgun mailing list
-        mg_result = mailgun.create(kwargs["address"])
+        # Next, attempt to add the addresses to the Mailgun mailing list
+        try:
+            mg_added = mailgun.create(addresses)
+        except httpx.HTTPError:
+            mg_added = False
 
-        # The address was not successfully recorded in Mailgun.
+        # The addresses were not successfully recorded in Mailgun.
         # We do not want to keep them in our database and make the lists consistent
-        if mg_result.status_code != codes.ok:
-            for addr in kwargs["address"]:
-                db.delete(addr)
+        if not mg_added:
+            db.delete_many(added)
             abort(500, message="Unable to add provided email address to mailing list.")
 
     @emails.arguments(models.Address, as_kwargs=True)
@@ -1,12 +1,16 @@
 from datetime import date, timedelta
+from typing import Any
 
+from flask import current_app, request, send_file, stream_with_context
 from flask.views import MethodView
 from flask_smorest import abort
 
 import src.core.database.v2 as db
+from src.configuration import get_config
+from src.core import jobs, rate_limit, response_cache
 from src.core.auth_helpers import require_permission
 from src.core.models.v2 import Archive as models
-from src.core.models.v2 import Generic
+from src.core.models.v2 import Generic, Jobs
 from src.views import archive
 
 
@@ -15,25 +19,110 @@ class Archive(MethodView):
     @archive.response(200, models.File)
     @archive.alt_response(404, schema=Generic.HttpError)
     def get(self):
-        """Get the file name of the newest Prompt archive."""
+        """Get the details of the newest Prompt archive."""
         if (file := db.archive.current()) is not None:
-            return {"file_name": file}
+            return file
 
         # We don't have an archive to download. This really shouldn't happen
         # but it can if an archive hasn't been generated for a few days
         abort(404, message="Latest Prompt archive currently unavailable.")
 
+    @rate_limit.budget("archive")
     @require_permission("archive")
-    @archive.response(201, models.File)
+    @archive.response(202, Jobs.Job)
     @archive.alt_response(403, schema=Generic.HttpError)
-    @archive.alt_response(404, schema=Generic.HttpError)
     def post(self):
         """Generate a new Prompt archive using today's date.
 
+        The archive is generated in the background, and the returned
+        job can be checked for the outcome. If an archive is already
+        being generated, that job is provided instead of starting another.
+
         * **Permission Required**: `has_archive`
         """
-        # Attempt to create a new archive file
-        if (file := db.archive.create()) is not None:
-            return {"file_name": file}
+        if (job := db.jobs.active("archive")) is not None:
+            return job
+        return jobs.queue("archive", {}, total=db.archive.count())
+
+
+@archive.route("/download/<file_name>")
+@response_cache.exempt
+class ArchiveDownload(MethodView):
+    @archive.arguments(models.FileName, location="path", as_kwargs=True)
+    @archive.response(200)
+    @archive.alt_response(404, schema=Generic.HttpError)
+    def get(self, **kwargs: dict[str, Any]):
+        """Download a Prompt archive.
+
+        Partial and conditional downloads are supported. Where configured,
+        sending the file itself is handed off to the web server.
+        """
+        if (file := db.archive.get(kwargs["file_name"])) is None:
+            abort(404, message=f"Prompt archive {kwargs['file_name']} not found.")
+
+        # nginx sends the file (and handles any ranges) itself
+        if accel_prefix := get_config("ARCHIVE_ACCEL_REDIRECT"):
+            response = current_app.response_class(mimetype=db.archive.FILE_MIMETYPE)
+            response.headers["X-Accel-Redirect"] = (
+                f"{accel_prefix.rstrip('/')}/{file['file_name']}"
+            )
+            response.headers["Content-Disposition"] = (
+                f'attachment; filename="{file["file_name"]}"'
+            )
+            response.set_etag(file["sha256"])
+            response.last_modified = file["date_generated"]
+            return response.make_conditional(request)
+
+        # Otherwise Flask handles the ranges, and uses X-Sendfile if turned on
+        return send_file(
+            db.archive.path(file),
+            mimetype=db.archive.FILE_MIMETYPE,
+            as_attachment=True,
+            download_name=file["file_name"],
+            conditional=True,
+            etag=file["sha256"],
+            last_modified=file["date_generated"],
+        )
+
+
+@archive.route("/export")
+@rate_limit.budget("export")
+class ArchiveExport(MethodView):
+    @archive.arguments(models.Export, location="query", as_kwargs=True)
+    @archive.response(200)
+    @archive.alt_response(400, schema=Generic.HttpError)
+    def get(self, **kwargs: dict[str, Any]):
+        """Download every archived Prompt in a machine-friendly format.
+
+        CSV (the default), JSON Lines, and Parquet exports are available.
+        Exports are streamed as they are read from the database.
+        """
+        if (export := db.archive.export(kwargs["format"])) is None:
+            abort(400, message=f"Prompt archive {kwargs['format']} export unavailable.")
+
+        return current_app.response_class(
+            stream_with_context(export.chunks),
+            mimetype=export.mimetype,
+            headers={
+                "Content-Disposition": f'attachment; filename="{export.file_name}"'
+            },
+        )
 
-        abort(404, message="Unable to generate new Prompt archive file.")
+
+@archive.route("/jobs/<int:job_id>")
+class ArchiveJob(MethodView):
+    @require_permission("archive")
+    @archive.arguments(Jobs.JobId, location="path", as_kwargs=True)
+    @archive.response(200, Jobs.Job)
+    @archive.alt_response(403, schema=Generic.HttpError)
+    @archive.alt_response(404, schema=Generic.HttpError)
+    def get(self, **kwargs: dict[str, Any]):
+        """Get the progress of a Prompt archive generation job.
+
+        Once the job is done, its result is the new archive's file name.
+
+        * **Permission Required**: `has_archive`
+        """
+        if (job := db.jobs.get(kwargs["job_id"], "archive")) is None:
+            abort(404, message=f"Unable to get Prompt archive job {kwargs['job_id']}.")
+        return job
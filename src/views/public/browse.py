@@ -53,8 +53,12 @@ class BrowseForYearMonth(MethodView):
 class BrowseYears(MethodView):
     @browse.response(200, models.GetYears)
     def get(self):
-        """Get a list of years Prompts has been recorded."""
-        return {"years": db.prompts.get_years()}
+        """Get a list of years Prompts has been recorded.
+
+        The total number of Prompts recorded in each year is also provided.
+        """
+        years = db.calendar.years()
+        return {"years": [row.year for row in years], "totals": years}
 
 
 @browse.route("/years/<int:year>")
@@ -63,7 +67,10 @@ class BrowseMonths(MethodView):
     @browse.response(200, models.GetMonths)
     @browse.alt_response(404, schema=Generic.HttpError)
     def get(self, **kwargs: dict[str, Any]):
-        """Get a list of months in a given year Prompts has been recorded."""
-        if months := db.prompts.get_months(kwargs["year"]):
-            return {"months": months}
+        """Get a list of months in a given year Prompts has been recorded.
+
+        The total number of Prompts recorded in each month is also provided.
+        """
+        if months := db.calendar.months(kwargs["year"]):
+            return {"months": [row.month for row in months], "totals": months}
         abort(404, message=f"No data available for calendar year {kwargs['year']}.")
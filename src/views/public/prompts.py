@@ -4,8 +4,9 @@ from flask.views import MethodView
 from flask_smorest import abort
 
 import src.core.database.v2 as db
+from src.core import jobs
 from src.core.auth_helpers import require_permission
-from src.core.models.v2 import Generic
+from src.core.models.v2 import Generic, Jobs
 from src.core.models.v2 import Prompts as models
 from src.views import prompts
 
@@ -94,7 +95,8 @@ class PromptAlter(MethodView):
     def delete(self, **kwargs: dict[str, Any]):
         """Delete an existing Prompt.
 
-        This will also delete any and all associated media record and files.
+        This will also delete any and all associated media records. Media files
+        no longer used by any Prompt are removed by the media garbage collection.
 
         * **Permission Required**: `has_prompts`
         """
@@ -133,19 +135,25 @@ class MediaCreate(MethodView):
     @require_permission("prompts")
     @prompts.arguments(models.PromptId, location="path", as_kwargs=True)
     @prompts.arguments(models.MediaItems, location="json", as_kwargs=True)
-    @prompts.response(201, schema=Generic.Empty)
+    @prompts.response(202, Jobs.Job)
     @prompts.alt_response(403, schema=Generic.HttpError)
     @prompts.alt_response(404, schema=Generic.HttpError)
     def post(self, **kwargs: dict[str, Any]):
         """Create a Prompt Media record.
 
+        Downloading the media can take some time, so it is done in the background.
+        The returned job can be checked for the outcome.
+
         * **Permission Required**: `has_prompts`
         """
-        if not db.prompts.create_media(kwargs["id"], kwargs["items"]):
+        if not db.prompts.exists_by_id(kwargs["id"]):
             abort(
                 404, message=f"Unable to record Prompt Media for Prompt {kwargs['id']}."
             )
 
+        payload = {"prompt_id": kwargs["id"], "items": kwargs["items"]}
+        return jobs.queue("media", payload, total=len(kwargs["items"]))
+
     @require_permission("prompts")
     @prompts.arguments(models.PromptId, location="path", as_kwargs=True)
     @prompts.arguments(models.MediaUpdate, location="json", as_kwargs=True)
@@ -166,6 +174,26 @@ class MediaCreate(MethodView):
                 message=f"Unable to update Prompt {kwargs['id']} with the given Media.",
             )
 
+        # Any replaced media needs new image variants
+        jobs.queue("media_variants", {"prompt_id": kwargs["id"]})
+
+
+@prompts.route("/media/jobs/<int:job_id>")
+class MediaJob(MethodView):
+    @require_permission("prompts")
+    @prompts.arguments(Jobs.JobId, location="path", as_kwargs=True)
+    @prompts.response(200, Jobs.Job)
+    @prompts.alt_response(403, schema=Generic.HttpError)
+    @prompts.alt_response(404, schema=Generic.HttpError)
+    def get(self, **kwargs: dict[str, Any]):
+        """Get the progress of a Prompt Media creation job.
+
+        * **Permission Required**: `has_prompts`
+        """
+        if (job := db.jobs.get(kwargs["job_id"], "media")) is None:
+            abort(404, message=f"Unable to get Prompt Media job {kwargs['job_id']}.")
+        return job
+
 
 @prompts.route("/<int:id>/media/<int:media_id>")
 class MediaChange(MethodView):
@@ -4,12 +4,19 @@ from flask.views import MethodView
 from flask_smorest import abort
 
 import src.core.database.v2 as db
+from src.core import rate_limit
 from src.core.models.v2 import Generic
 from src.core.models.v2 import Search as models
+from src.core.search import Cursor
 from src.views import search
 
 
+# The number of results on a page, when a page is asked for without a `limit`
+PAGE_SIZE = 100
+
+
 @search.route("/host/<string:query>")
+@rate_limit.budget("search")
 class SearchByHost(MethodView):
     @search.arguments(models.Query, location="path", as_kwargs=True)
     @search.response(200, models.Results)
@@ -31,15 +38,41 @@ class SearchByHost(MethodView):
 
 
 @search.route("/query/<string:query>")
+@rate_limit.budget("search")
 class SearchByQuery(MethodView):
     @search.arguments(models.Query, location="path", as_kwargs=True)
+    @search.arguments(models.Page, location="query", as_kwargs=True)
     @search.response(200, models.Results)
     @search.alt_response(422, schema=Generic.HttpError)
-    def get(self, **kwargs: dict[str, Any]):
-        """Search available Prompts words by query.
+    def get(self, **kwargs: Any):
+        """Search available Prompts words and content by query.
 
         Queries less than 2 characters are refused and will always return a 422 error.
+
+        Without a `limit` or `after`, every matching Prompt is given in
+        alphabetical order.
+
+        Otherwise, results are paginated and ordered by relevance, with a match
+        on the Prompt word ranked above a match in the Prompt content. The `total`
+        is the number of all matching Prompts. If there are more results than the
+        given `limit`, the `next` value can be given as `after` to get the next
+        page of results.
         """
         query = kwargs["query"].strip()
-        r = db.prompts.search(query)
-        return {"prompts": r, "total": len(r), "query": query}
+        try:
+            after = Cursor.from_str(kwargs["after"]) if kwargs["after"] else None
+        except ValueError:
+            abort(422, message="Invalid search results cursor.")
+
+        # Only paginate the results if a page was asked for
+        limit = kwargs["limit"]
+        if limit is None and after is not None:
+            limit = PAGE_SIZE
+
+        r = db.prompts.search(query, limit=limit, after=after)
+        return {
+            "prompts": r.prompts,
+            "total": r.total,
+            "query": query,
+            "next": str(r.next) if r.next else None,
+        }